@@ -0,0 +1,178 @@
+import csv
+import math
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from EngineBatch import EngineBatch
+from Lubrication import Lubrication
+
+# One measured dyno run; temperature and oil_temperature may be None when they were not logged
+DynoTrace = namedtuple("DynoTrace", ["name", "time", "rpm", "torque", "temperature", "oil_temperature"])
+
+# Engine attributes fitted by the calibration and the range searched for each
+BOUNDS = {
+    "max_torque": (10.0, 2000.0),  # Nm
+    "peak_torque_rpm": (500.0, 15000.0),
+    "max_power_rpm": (1000.0, 20000.0),
+    "idle_rpm": (300.0, 2000.0),
+    "cooling_per_rpm": (0.0, 0.01),
+    "cooling_offset": (0.0, 1.0),
+    "idle_cooling_reduction": (0.0, 0.1),
+    "warm_idle_temperature": (30.0, 120.0),  # °C
+}
+THERMAL_PARAMETERS = ("cooling_per_rpm", "cooling_offset", "idle_cooling_reduction", "warm_idle_temperature")
+
+# Loss = mean (torque error / TORQUE_SCALE)^2 + mean |temperature error| / TEMPERATURE_SCALE
+TORQUE_SCALE = 10.0  # Nm
+TEMPERATURE_SCALE = 1.0  # °C
+
+
+def load_dyno_trace(path):
+    """
+    Read a dyno CSV with 'time' (s), 'rpm' and 'torque' (Nm) columns and optional
+    'temperature' and 'oil_temperature' (°C) columns.
+    """
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    columns = {key: np.array([float(row[key]) for row in rows]) for key in rows[0] if key in DynoTrace._fields}
+    return DynoTrace(path, columns["time"], columns["rpm"], columns["torque"], columns.get("temperature"), columns.get("oil_temperature"))
+
+
+class Calibration:
+    """
+    Fits Engine torque-curve and thermal parameters to dyno traces with the cross-entropy method.
+    Each iteration evaluates the whole population against every trace at once through EngineBatch:
+    the torque curve is evaluated per sample and the temperature is advanced in closed form between samples.
+    """
+
+    def __init__(self, engine, traces, parameters=tuple(BOUNDS), population=128, elite_fraction=0.2, seed=None):
+        self.engine = engine
+        self.traces = traces
+        self.parameters = list(parameters)
+        self.population = population
+        self.elite_count = max(int(population * elite_fraction), 2)
+        self.generator = np.random.default_rng(seed)
+        self.low = np.array([BOUNDS[name][0] for name in self.parameters])
+        self.high = np.array([BOUNDS[name][1] for name in self.parameters])
+
+        # Traces padded to a common length; columns past a trace's end are masked out
+        length = max(len(trace.time) for trace in traces)
+        count = len(traces)
+        self.rpm = np.zeros((count, length))
+        self.measured_torque = np.zeros((count, length))
+        self.measured_temperature = np.zeros((count, length))
+        self.ticks = np.zeros((count, length), dtype=np.int64)
+        self.torque_mask = np.zeros((count, length), dtype=bool)
+        self.temperature_mask = np.zeros((count, length), dtype=bool)
+        self.friction = np.zeros((count, length))
+
+        lubrication = Lubrication()
+        for row, trace in enumerate(traces):
+            samples = len(trace.time)
+            self.rpm[row, :samples] = trace.rpm
+            self.measured_torque[row, :samples] = trace.torque
+            self.torque_mask[row, :samples] = True
+            # Engine ticks between consecutive samples, rpm is held at the later sample's value
+            self.ticks[row, 1:samples] = np.round(np.diff(trace.time) / engine.time_step).astype(np.int64)
+
+            coolant = trace.temperature if trace.temperature is not None else np.full(samples, engine.normal_temperature)
+            if trace.temperature is not None:
+                self.measured_temperature[row, :samples] = trace.temperature
+                self.temperature_mask[row, 1:samples] = True
+
+            # Friction does not depend on the fitted parameters. Without a logged oil temperature
+            # the oil starts at the coolant temperature and follows it as in Lubrication.update
+            oil = coolant[0]
+            decay = 1 - min(engine.time_step / lubrication.oil_time_constant(), 1.0)
+            for sample in range(samples):
+                if trace.oil_temperature is not None:
+                    oil = trace.oil_temperature[sample]
+                else:
+                    target = coolant[sample] + trace.rpm[sample] / 1000 * 2.0
+                    oil = target + (oil - target) * decay ** self.ticks[row, sample]
+                _, fmep = lubrication.lookup(trace.rpm[sample], oil)
+                self.friction[row, sample] = fmep * 1e5 * engine.displacement * 1e-3 / (4 * math.pi)
+
+        self.fit_temperature = bool(self.temperature_mask.any()) and any(name in THERMAL_PARAMETERS for name in self.parameters)
+
+    def batch_for(self, candidates, copies=1):
+        """EngineBatch with each candidate repeated copies times in a row."""
+        parameters = EngineBatch.engine_parameters(self.engine)
+        for column, name in enumerate(self.parameters):
+            parameters[name] = np.repeat(candidates[:, column], copies)
+        return EngineBatch(len(candidates) * copies, **parameters)
+
+    def evaluate(self, candidates):
+        """Loss of every candidate row, inf for candidates with idle < peak torque < max power violated."""
+        count, traces = len(candidates), len(self.traces)
+
+        # Torque curve of every candidate at every sample of every trace in one call
+        predicted = self.batch_for(candidates).calculate_torque_at(self.rpm.ravel()) - self.friction.ravel()
+        residual = np.where(self.torque_mask.ravel(), predicted - self.measured_torque.ravel(), 0.0)
+        loss = (residual ** 2).sum(axis=1) / self.torque_mask.sum() / TORQUE_SCALE ** 2
+
+        if self.fit_temperature:
+            # One variant per (candidate, trace), stepped sample by sample; exact for rpm held between samples
+            batch = self.batch_for(candidates, traces)
+            rpm, ticks, measured, mask = (np.tile(values, (count, 1)).T.copy() for values in
+                                          (self.rpm, self.ticks, self.measured_temperature, self.temperature_mask))
+            batch.normal_temperature = measured[0].copy()
+            temperature_error = np.zeros(count * traces)
+            for sample in range(1, len(rpm)):
+                batch.rpm = rpm[sample]
+                batch.advance_temperature(ticks[sample])
+                # Absolute error: sampling between ticks can shift where the cooling stops by up to one tick
+                temperature_error += np.where(mask[sample], np.abs(batch.normal_temperature - measured[sample]), 0.0)
+            loss += temperature_error.reshape(count, traces).sum(axis=1) / self.temperature_mask.sum() / TEMPERATURE_SCALE
+
+        values = {name: candidates[:, column] for column, name in enumerate(self.parameters)}
+        idle = values.get("idle_rpm", self.engine.idle_rpm)
+        peak = values.get("peak_torque_rpm", self.engine.peak_torque_rpm)
+        max_power = values.get("max_power_rpm", self.engine.max_power_rpm)
+        return np.where((idle < peak) & (peak < max_power), loss, np.inf)
+
+    def fit(self, iterations=60, tolerance=1e-9):
+        """Run the optimizer from the engine's current parameters; returns (parameters, loss)."""
+        mean = np.array([getattr(self.engine, name) for name in self.parameters], dtype=float)
+        spread = (self.high - self.low) / 8
+        best, best_loss = mean.copy(), self.evaluate(mean[None, :])[0]
+
+        for _ in range(iterations):
+            candidates = np.clip(mean + spread * self.generator.standard_normal((self.population, len(mean))), self.low, self.high)
+            losses = self.evaluate(candidates)
+            elite = candidates[np.argsort(losses)[:self.elite_count]]
+            if losses.min() < best_loss:
+                best, best_loss = candidates[np.argmin(losses)], losses.min()
+            # Smoothed update keeps the search from collapsing too early
+            mean = 0.7 * elite.mean(axis=0) + 0.3 * mean
+            spread = 0.7 * elite.std(axis=0) + 0.3 * spread
+            if (spread / (self.high - self.low)).max() < tolerance:
+                break
+        return dict(zip(self.parameters, best.tolist())), float(best_loss)
+
+    @staticmethod
+    def apply(engine, parameters):
+        for name, value in parameters.items():
+            setattr(engine, name, value)
+
+
+if __name__ == "__main__":
+    from Engine import Engine
+
+    if len(sys.argv) < 3:
+        print("usage: python Calibration.py <engine.toml|default> <trace.csv> [trace.csv ...]")
+        sys.exit(1)
+    if sys.argv[1] == "default":
+        engine = Engine()
+    else:
+        from EngineConfig import load_engine
+        engine = load_engine(sys.argv[1])
+
+    started = time.perf_counter()
+    parameters, loss = Calibration(engine, [load_dyno_trace(path) for path in sys.argv[2:]]).fit()
+    print(f"# fitted in {time.perf_counter() - started:.1f} s, loss {loss:.4g}")
+    for name, value in parameters.items():
+        print(f"{name} = {value:.6g}")
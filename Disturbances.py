@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class Disturbances:
+    """Seeded misfires, ignition jitter and sensor noise, pre-drawn in blocks of ticks."""
+
+    def __init__(self, ignition_module, seed=None, misfire_probability=0.002, ignition_jitter=1.5,
+                 rpm_noise=10.0, temperature_noise=0.3, block_size=4096):
+        self.ignition_module = ignition_module
+        self.cylinders = ignition_module.cylinder_counter
+        self.misfire_probability = misfire_probability
+        self.ignition_jitter = ignition_jitter  # Standard deviation, crank degrees
+        self.rpm_noise = rpm_noise  # Standard deviation of the rpm sensor, rpm
+        self.temperature_noise = temperature_noise  # Standard deviation of the temperature sensor, °C
+        self.block_size = block_size
+
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.default_rng(seed)
+
+        # Draw the first block now so the sensors can read noise before the first next_tick()
+        self.refill()
+
+    def spawn(self, ignition_modules):
+        """Independent child streams with the same settings, one per ignition module of a fleet."""
+        return [
+            Disturbances(ignition_module, child, self.misfire_probability, self.ignition_jitter,
+                         self.rpm_noise, self.temperature_noise, self.block_size)
+            for ignition_module, child in zip(ignition_modules, self.seed_sequence.spawn(len(ignition_modules)))
+        ]
+
+    @classmethod
+    def fleet(cls, engines, seed=None, **settings):
+        """Attach an independent, reproducible disturbance stream to every engine."""
+        streams = np.random.SeedSequence(seed).spawn(len(engines))
+        for engine, stream in zip(engines, streams):
+            engine.disturbances = cls(engine.ignition_module, stream, **settings)
+
+    def refill(self):
+        """Draw the next block of disturbances for every tick and cylinder at once."""
+        shape = (self.block_size, self.cylinders)
+        self.misfires = self.generator.random(shape) < self.misfire_probability
+        self.jitter = self.generator.normal(0.0, self.ignition_jitter, shape)
+        # Values are read one at a time, plain floats are much cheaper to index than numpy scalars
+        self.efficiency_block = self.ignition_module.combustion_efficiency(self.misfires, self.jitter).tolist()
+        self.rpm_noise_block = self.generator.normal(0.0, self.rpm_noise, self.block_size).tolist()
+        self.temperature_noise_block = self.generator.normal(0.0, self.temperature_noise, self.block_size).tolist()
+        self.position = 0
+
+    def next_tick(self):
+        if self.position + 1 >= self.block_size:
+            self.refill()
+        else:
+            self.position += 1
+
+    def skip(self, ticks):
+        """Same as calling next_tick() ticks times."""
+        for _ in range(ticks):
+            self.next_tick()
+
+    def cylinder_efficiency(self, cylinder):
+        """Share of the nominal torque delivered by a cylinder firing this tick."""
+        return self.efficiency_block[self.position][cylinder]
+
+    def rpm_error(self):
+        return self.rpm_noise_block[self.position]
+
+    def temperature_error(self):
+        return self.temperature_noise_block[self.position]
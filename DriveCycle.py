@@ -0,0 +1,204 @@
+import bisect
+import csv
+import math
+import os
+import sys
+import time
+from collections import namedtuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from Fuel import Fuel
+from FuelPump import FuelPump
+
+GRAVITY = 9.81
+AIR_DENSITY = 1.2  # kg/m^3
+
+# ECE-15 urban cycle as (time s, speed km/h) points, linear in between
+# Slowest acceptable headless run, in simulated seconds per wall-clock second
+REALTIME_TARGET = 1000.0
+
+ECE15 = [
+    (0, 0), (11, 0), (15, 15), (23, 15), (28, 0), (49, 0), (61, 32), (85, 32), (96, 0),
+    (117, 0), (143, 50), (155, 50), (163, 35), (176, 35), (188, 0), (195, 0),
+]
+
+CycleSummary = namedtuple("CycleSummary", [
+    "name", "duration", "distance_km", "fuel_liters", "liters_per_100km",
+    "mean_speed_kmh", "rms_speed_error_kmh", "max_speed_error_kmh", "wall_time", "realtime_factor",
+])
+
+
+def load_trace(path):
+    """Read a speed trace from a CSV file with 'time' (s) and 'speed' (km/h) columns."""
+    with open(path, newline="") as file:
+        return [(float(row["time"]), float(row["speed"])) for row in csv.DictReader(file)]
+
+
+class Vehicle:
+    """Longitudinal vehicle and drivetrain load on the engine."""
+
+    def __init__(self, mass=1300.0, wheel_radius=0.31, gear_ratios=(3.6, 2.1, 1.4, 1.0, 0.8), final_drive=4.1,
+                 rolling_resistance=0.012, drag_area=0.65, drivetrain_efficiency=0.92, max_brake_force=12000.0,
+                 upshift_rpm=2500.0, downshift_rpm=1200.0):
+        self.mass = mass  # kg
+        self.wheel_radius = wheel_radius  # m
+        self.gear_ratios = gear_ratios
+        self.final_drive = final_drive
+        self.rolling_resistance = rolling_resistance
+        self.drag_area = drag_area  # Cd * frontal area, m^2
+        self.drivetrain_efficiency = drivetrain_efficiency
+        self.max_brake_force = max_brake_force  # N
+        self.upshift_rpm = upshift_rpm
+        self.downshift_rpm = downshift_rpm
+
+        self.speed = 0.0  # m/s
+        self.gear = 0  # Index into gear_ratios
+
+    def total_ratio(self):
+        return self.gear_ratios[self.gear] * self.final_drive
+
+    def engine_rpm(self):
+        """Crankshaft rpm with the clutch closed at the current speed and gear."""
+        return self.speed / self.wheel_radius * self.total_ratio() * 30 / math.pi
+
+    def shift(self):
+        rpm = self.engine_rpm()
+        if rpm > self.upshift_rpm and self.gear + 1 < len(self.gear_ratios):
+            self.gear += 1
+        elif rpm < self.downshift_rpm and self.gear > 0:
+            self.gear -= 1
+
+    def resistance(self):
+        """Rolling and aerodynamic resistance in N."""
+        rolling = self.mass * GRAVITY * self.rolling_resistance if self.speed > 0 else 0.0
+        return rolling + 0.5 * AIR_DENSITY * self.drag_area * self.speed ** 2
+
+
+class Driver:
+    """PI speed controller with target-acceleration feedforward; pedal > 0 is throttle, < 0 is brake."""
+
+    def __init__(self, kp=0.6, ki=0.08, kf=0.5):
+        self.kp = kp  # per m/s of error
+        self.ki = ki  # per m of accumulated error
+        self.kf = kf  # per m/s^2 of target acceleration
+        self.integral = 0.0
+
+    def pedal(self, target_speed, target_acceleration, speed, dt):
+        error = target_speed - speed
+        pedal = self.kf * target_acceleration + self.kp * error + self.ki * self.integral
+        # Stop integrating while saturated so the controller does not wind up
+        if -1.0 < pedal < 1.0:
+            self.integral += error * dt
+        return min(max(pedal, -1.0), 1.0)
+
+
+class DriveCycleRunner:
+    """Runs an Engine through a speed trace with a vehicle load, headless and faster than real time."""
+
+    def __init__(self, engine, vehicle=None, driver=None, dt=0.1, indicated_efficiency=0.36, idle_fuel_flow=0.15):
+        self.engine = engine
+        self.vehicle = vehicle or Vehicle()
+        self.driver = driver or Driver()
+        self.fuel = Fuel()
+        self.fuel_pump = FuelPump()
+        self.dt = dt  # s
+        self.indicated_efficiency = indicated_efficiency  # Combustion power / fuel power
+        self.idle_fuel_flow = idle_fuel_flow  # g/s
+
+    def run(self, trace, name="cycle"):
+        """Simulate one pass of a (time, km/h) trace and return a CycleSummary."""
+        engine, vehicle, driver, dt = self.engine, self.vehicle, self.driver, self.dt
+        if not engine.is_running:
+            engine.start()
+        vehicle.speed, vehicle.gear, driver.integral = 0.0, 0, 0.0
+
+        times = [point[0] for point in trace]
+        speeds = [point[1] / 3.6 for point in trace]
+        duration = times[-1] - times[0]
+        steps = int(round(duration / dt))
+        substeps = max(int(round(dt / engine.time_step)), 1)
+        supply = 1.0  # Share of the requested fuel the pump delivered last step
+        joules_per_gram = self.fuel.heating_value * 1000
+
+        distance = fuel_grams = squared_error = max_error = speed_sum = 0.0
+        wall_start = time.perf_counter()
+        for step in range(steps):
+            now = times[0] + step * dt
+            segment = min(bisect.bisect_right(times, now), len(times) - 1)
+            start_time, end_time = times[segment - 1], times[segment]
+            slope = (speeds[segment] - speeds[segment - 1]) / (end_time - start_time) if end_time > start_time else 0.0
+            target = speeds[segment - 1] + slope * (now - start_time)
+
+            pedal = driver.pedal(target, slope, vehicle.speed, dt)
+            throttle = max(pedal, 0.0)
+            brake = max(-pedal, 0.0)
+
+            # The engine takes the dt as one jump of its own time steps at the vehicle's rpm, so temperature,
+            # ignition and the ECU stay coupled without paying for every engine step
+            vehicle.shift()
+            # The clutch slips below idle, so the engine never drops under idle_rpm while driving
+            engine.simulate_at_rpm(max(vehicle.engine_rpm(), engine.idle_rpm), throttle * supply, substeps)
+
+            # Fuel for the combustion power asked for; a pump that cannot keep up cuts the torque from the next step
+            wanted_power = engine.indicated_torque / supply * engine.rpm * (math.pi / 30) / 1000
+            demand = self.idle_fuel_flow + wanted_power * 1000 / (self.indicated_efficiency * joules_per_gram)
+            flow = self.fuel_pump.deliver(demand)
+            supply = flow / demand if flow < demand else 1.0
+            fuel_grams += flow * dt
+
+            # Friction is taken from the wheels too, so a closed throttle gives engine braking
+            drive_force = engine.torque * vehicle.total_ratio() * vehicle.drivetrain_efficiency / vehicle.wheel_radius
+            force = drive_force - vehicle.resistance() - brake * vehicle.max_brake_force
+            vehicle.speed = max(vehicle.speed + force / vehicle.mass * dt, 0.0)
+
+            distance += vehicle.speed * dt
+            speed_sum += vehicle.speed
+            error = abs(vehicle.speed - target) * 3.6
+            squared_error += error * error
+            max_error = max(max_error, error)
+        wall_time = time.perf_counter() - wall_start
+
+        distance_km = distance / 1000
+        fuel_liters = fuel_grams / 1000 / self.fuel.density
+        return CycleSummary(
+            name=name,
+            duration=duration,
+            distance_km=distance_km,
+            fuel_liters=fuel_liters,
+            liters_per_100km=fuel_liters / distance_km * 100 if distance_km > 0 else float("inf"),
+            mean_speed_kmh=speed_sum / max(steps, 1) * 3.6,
+            rms_speed_error_kmh=math.sqrt(squared_error / max(steps, 1)),
+            max_speed_error_kmh=max_error,
+            wall_time=wall_time,
+            realtime_factor=duration / wall_time if wall_time > 0 else float("inf"),
+        )
+
+    def run_all(self, cycles):
+        """Run several named traces, given as {name: trace}."""
+        return [self.run(trace, name) for name, trace in cycles.items()]
+
+
+def print_summaries(summaries, realtime_target=REALTIME_TARGET):
+    """Print one row per cycle; cycles that ran slower than realtime_target times real time are flagged."""
+    print(f"{'cycle':<12}{'km':>8}{'L':>8}{'L/100km':>9}{'rms km/h':>10}{'max km/h':>10}{'x real':>10}")
+    for summary in summaries:
+        flag = "  below target" if summary.realtime_factor < realtime_target else ""
+        print(f"{summary.name:<12}{summary.distance_km:>8.2f}{summary.fuel_liters:>8.3f}{summary.liters_per_100km:>9.2f}"
+              f"{summary.rms_speed_error_kmh:>10.2f}{summary.max_speed_error_kmh:>10.2f}{summary.realtime_factor:>10.0f}{flag}")
+    print(f"realtime target: {realtime_target:.0f}x")
+
+
+if __name__ == "__main__":
+    from Engine import Engine
+
+    if len(sys.argv) > 1:
+        from EngineConfig import load_engine
+        engine = load_engine(sys.argv[1])
+    else:
+        engine = Engine()
+
+    cycles = {"ECE-15": ECE15}
+    for path in sys.argv[2:]:
+        cycles[os.path.splitext(os.path.basename(path))[0]] = load_trace(path)
+    print_summaries(DriveCycleRunner(engine).run_all(cycles))
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from Fuel import Fuel
+
+# Spark map grid: engine rpm x load (0 closed throttle .. 1 wide open)
+TABLE_MAX_RPM = 10000.0
+TABLE_RPM_POINTS = 41
+TABLE_LOAD_POINTS = 11
+
+# Idle target grid: coolant temperature
+IDLE_MIN_TEMPERATURE = -30.0  # °C
+IDLE_MAX_TEMPERATURE = 120.0  # °C
+IDLE_TEMPERATURE_POINTS = 16
+
+# Controller timing is kept per rpm band so high-rpm budget compliance can be read off directly
+TIMING_BAND_RPM = 1000.0
+TIMING_BANDS = 10  # The last band holds everything above 9000 rpm
+MAX_RECORDED_OVERRUNS = 1000
+
+
+def mbt_table(rpm, load):
+    """Spark advance for best torque in degrees before TDC: more at high rpm, less at high load."""
+    return 12.0 + 22.0 * np.minimum(rpm / 5000.0, 1.0) - 8.0 * load
+
+
+def knock_limit_table(rpm, load, octane):
+    """Most advance in degrees before TDC that does not knock; higher octane and lower load allow more."""
+    return 10.0 + 25.0 * (1.0 - load) + 8.0 * np.minimum(rpm / 6000.0, 1.0) + 1.5 * (octane - 95.0)
+
+
+def idle_target_table(coolant_temperature, idle_rpm, fast_idle=400.0):
+    """Idle rpm target, raised while the engine is cold and fading out between 20 and 80 °C."""
+    return idle_rpm + fast_idle * np.clip((80.0 - coolant_temperature) / 60.0, 0.0, 1.0)
+
+
+class ECU:
+    """
+    Engine control unit running at a fixed control rate between simulate() calls.
+    A PI idle-speed controller sets the throttle while the pedal is released, and the spark advance
+    comes from an rpm x load map clamped to the knock limit of the fuel. All maps are precomputed,
+    a control tick is three table lookups. Attach as engine.ecu.
+    """
+
+    def __init__(self, engine, fuel=None, control_rate=100.0, kp=0.5, ki=2.0, idle_pedal=0.02, budget_ns=50_000):
+        self.fuel = fuel or Fuel()
+        self.control_period = max(int(round(1.0 / (control_rate * engine.time_step))), 1)  # simulate() calls per control tick
+        self.kp = kp  # Air per unit of rpm error relative to the rpm range
+        self.ki = ki  # Same, per second of accumulated error
+        self.idle_pedal = idle_pedal  # Pedal below which the idle controller takes over
+        self.budget_ns = budget_ns  # Allowed time per control tick
+
+        self.ticks = 0
+        self.integral = 0.0
+        self.idle_target = engine.idle_rpm
+        self.throttle = 0.0  # Throttle command sent to the engine
+        self.spark_advance = engine.ignition_scheduler.spark_advance  # Degrees before TDC
+        self.knock_retard = 0.0  # Degrees taken off the map by the knock limit
+        self.spark_efficiency = 1.0  # Torque share left after running away from best-torque advance
+
+        # Controller timing, overall and per rpm band
+        self.control_ticks = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.max_rpm = 0.0  # rpm of the slowest control tick
+        self.overruns = 0
+        self.overrun_log = []  # (rpm, ns) of the first MAX_RECORDED_OVERRUNS overruns
+        self.band_ticks = [0] * TIMING_BANDS
+        self.band_total_ns = [0] * TIMING_BANDS
+        self.band_max_ns = [0] * TIMING_BANDS
+        self.band_overruns = [0] * TIMING_BANDS
+
+        self.build_tables(engine)
+
+    def build_tables(self, engine):
+        """Precompute the maps for this engine and fuel; call again after changing either."""
+        rpm = np.linspace(0.0, TABLE_MAX_RPM, TABLE_RPM_POINTS)
+        load = np.linspace(0.0, 1.0, TABLE_LOAD_POINTS)
+        rpm_grid, load_grid = np.meshgrid(rpm, load, indexing="ij")
+        mbt = mbt_table(rpm_grid, load_grid)
+        advance = np.minimum(mbt, knock_limit_table(rpm_grid, load_grid, self.fuel.octane))
+        efficiency = engine.ignition_module.combustion_efficiency(False, advance - mbt)
+
+        # Nested lists: indexing them per control tick is far cheaper than indexing numpy arrays
+        self.advance_table = advance.tolist()
+        self.retard_table = (mbt - advance).tolist()
+        self.efficiency_table = efficiency.tolist()
+        self.rpm_step = rpm[1] - rpm[0]
+        self.load_step = load[1] - load[0]
+
+        temperature = np.linspace(IDLE_MIN_TEMPERATURE, IDLE_MAX_TEMPERATURE, IDLE_TEMPERATURE_POINTS)
+        self.idle_table = idle_target_table(temperature, engine.idle_rpm).tolist()
+        self.temperature_step = temperature[1] - temperature[0]
+
+    def lookup(self, rpm, load):
+        """Bilinear interpolation of (advance, knock retard, spark efficiency) at one operating point."""
+        x = min(max(rpm / self.rpm_step, 0.0), TABLE_RPM_POINTS - 1.000001)
+        y = min(max(load / self.load_step, 0.0), TABLE_LOAD_POINTS - 1.000001)
+        i, j = int(x), int(y)
+        fx, fy = x - i, y - j
+        weights = ((1 - fx) * (1 - fy), (1 - fx) * fy, fx * (1 - fy), fx * fy)
+
+        values = []
+        for table in (self.advance_table, self.retard_table, self.efficiency_table):
+            row, next_row = table[i], table[i + 1]
+            values.append(weights[0] * row[j] + weights[1] * row[j + 1] + weights[2] * next_row[j] + weights[3] * next_row[j + 1])
+        return values
+
+    def idle_lookup(self, coolant_temperature):
+        x = min(max((coolant_temperature - IDLE_MIN_TEMPERATURE) / self.temperature_step, 0.0), IDLE_TEMPERATURE_POINTS - 1.000001)
+        i = int(x)
+        return self.idle_table[i] + (x - i) * (self.idle_table[i + 1] - self.idle_table[i])
+
+    def update(self, engine, pedal, ticks=1):
+        """
+        Throttle to apply for the next ticks simulate() steps; runs a control tick every control_period steps.
+        When several control ticks fall inside a multi-step jump they run as one, integrating for all of them.
+        """
+        due = (self.ticks + ticks - 1) // self.control_period - (self.ticks - 1) // self.control_period
+        if due:
+            started = time.perf_counter_ns()
+            self.control(engine, pedal, due)
+            elapsed = time.perf_counter_ns() - started
+            self.record_timing(engine.rpm, elapsed)
+        self.ticks += ticks
+        # The pedal passes straight through between control ticks, the idle air only changes on them
+        return max(pedal, self.throttle) if pedal < self.idle_pedal else pedal
+
+    def control(self, engine, pedal, periods=1):
+        """One control tick: idle-speed PI, then spark advance for the resulting load; periods scales the integration."""
+        rpm_range = engine.max_power_rpm - engine.idle_rpm
+        if pedal < self.idle_pedal and engine.is_running:
+            self.idle_target = self.idle_lookup(engine.sensor_temperature)
+            error = (self.idle_target - engine.sensor_rpm) / rpm_range
+            # PI on air (throttle cubed, which the rpm follows linearly) with the steady-state air as feedforward
+            feedforward = (self.idle_target - engine.idle_rpm) / rpm_range
+            integral = self.integral + error * periods * self.control_period * engine.time_step
+            air = feedforward + self.kp * error + self.ki * integral
+            if 0.0 <= air <= 1.0:
+                self.integral = integral  # Anti-windup: only integrate while the output is not saturated
+            self.throttle = min(max(air, 0.0), 1.0) ** (1 / 3)
+        else:
+            self.throttle = 0.0
+
+        load = min(max(max(pedal, self.throttle), 0.0), 1.0)
+        self.spark_advance, self.knock_retard, self.spark_efficiency = self.lookup(engine.sensor_rpm, load)
+        engine.ignition_scheduler.spark_advance = self.spark_advance
+
+    def record_timing(self, rpm, elapsed):
+        band = min(int(rpm / TIMING_BAND_RPM), TIMING_BANDS - 1)
+        self.control_ticks += 1
+        self.total_ns += elapsed
+        self.band_ticks[band] += 1
+        self.band_total_ns[band] += elapsed
+        if elapsed > self.max_ns:
+            self.max_ns, self.max_rpm = elapsed, rpm
+        self.band_max_ns[band] = max(self.band_max_ns[band], elapsed)
+        if elapsed > self.budget_ns:
+            self.overruns += 1
+            self.band_overruns[band] += 1
+            if len(self.overrun_log) < MAX_RECORDED_OVERRUNS:
+                self.overrun_log.append((rpm, elapsed))
+
+    def timing(self):
+        """
+        Controller timing so far in microseconds: overall mean and worst tick (with its rpm), the share over
+        budget, and the same per rpm band as (low rpm, ticks, mean, max, overrun fraction) for visited bands.
+        """
+        ticks = max(self.control_ticks, 1)
+        bands = [
+            (band * TIMING_BAND_RPM, count, self.band_total_ns[band] / count / 1000, self.band_max_ns[band] / 1000,
+             self.band_overruns[band] / count)
+            for band, count in enumerate(self.band_ticks) if count
+        ]
+        return {
+            "control_ticks": self.control_ticks,
+            "mean_us": self.total_ns / ticks / 1000,
+            "max_us": self.max_ns / 1000,
+            "max_rpm": self.max_rpm,
+            "budget_us": self.budget_ns / 1000,
+            "overrun_fraction": self.overruns / ticks,
+            "bands": bands,
+        }
+
+
+if __name__ == "__main__":
+    from Engine import Engine
+
+    octane = float(sys.argv[1]) if len(sys.argv) > 1 else 95.0
+    fuel = Fuel()
+    fuel.octane = octane
+    engine = Engine()
+    engine.ecu = ECU(engine, fuel)
+    engine.start()
+
+    # Idle, a slow pedal ramp through every rpm band, wide open throttle, then back to idle
+    segments = (("idle", 2.0, lambda t: 0.0), ("ramp", 8.0, lambda t: t / 8.0), ("wide open", 3.0, lambda t: 1.0),
+                ("idle", 2.0, lambda t: 0.0))
+    for label, seconds, pedal in segments:
+        for step in range(int(seconds / engine.time_step)):
+            engine.simulate(pedal(step * engine.time_step))
+        print(f"{label:<10} {engine.rpm:7.1f} rpm (idle target {engine.ecu.idle_target:.0f}), "
+              f"advance {engine.ecu.spark_advance:5.1f}°, knock retard {engine.ecu.knock_retard:4.1f}°, torque {engine.torque:6.1f} Nm")
+    timing = engine.ecu.timing()
+    print(f"{timing['control_ticks']} control ticks, mean {timing['mean_us']:.1f} us, "
+          f"max {timing['max_us']:.1f} us at {timing['max_rpm']:.0f} rpm, "
+          f"{timing['overrun_fraction']:.2%} over the {timing['budget_us']:.0f} us budget")
+    print(f"{'rpm':>12}{'ticks':>8}{'mean us':>10}{'max us':>10}{'over':>8}")
+    for low, count, mean, worst, overrun in timing["bands"]:
+        print(f"{low:>5.0f}-{low + TIMING_BAND_RPM:<6.0f}{count:>8}{mean:>10.1f}{worst:>10.1f}{overrun:>8.1%}")
@@ -1,13 +1,30 @@
 import pygame
 import sys
+import os
 import math
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from IgnitionModule import IgnitionModule
+from StripChart import StripChart
+from IgnitionScheduler import IgnitionScheduler
+from Lubrication import Lubrication
+from SimulationThread import SimulationThread, RateMeter
+
+# Relative distance from the target rpm at which the rpm relaxation counts as converged
+STEADY_RPM_TOLERANCE = 1e-9
+
+# Seconds of history visible in the dashboard charts
+CHART_SECONDS = 10.0
+
 class Engine:
-    def __init__(self, cylinders=4, displacement=2.0, idle_rpm=800):
+    def __init__(self, cylinders=4, displacement=2.0, idle_rpm=800, firing_order=None, spark_advance=10.0):
         self.cylinders = cylinders
         self.displacement = displacement  # in liters
         self.rpm = 0.0  # Revolutions per minute
-        self.torque = 0.0  # Torque in Nm
+        self.torque = 0.0  # Torque in Nm, after friction
+        self.indicated_torque = 0.0  # Torque from combustion before friction in Nm
+        self.friction_torque = 0.0  # Friction and pumping losses in Nm
         self.power = 0.0  # Power in kW
         self.is_running = False  # Engine state
         self.idle_rpm = idle_rpm  # Idle RPM
@@ -15,16 +32,50 @@ class Engine:
         self.max_temperature = 120.0
         self.cooling_rate = 1.5
 
+        # Thermal coefficients, cooling_rate is recomputed from them every tick (see Calibration.py)
+        self.cooling_per_rpm = 0.001  # Cooling rate per rpm
+        self.cooling_offset = 0.001  # Cooling rate at zero rpm
+        self.idle_cooling_reduction = 0.0095  # Less cooling between 800 and 2000 rpm
+        self.warm_idle_temperature = 80.0  # Temperature held between 800 and 2000 rpm
+
         # Define torque curve parameters
         self.max_torque = 400.0  # Max torque at peak torque RPM (Nm)
         self.peak_torque_rpm = 5000  # RPM at which max torque occurs
         self.max_power_rpm = 6000  # RPM at which max power occurs
 
-        # Valve states
-        self.intake_valve_open = [False] * cylinders  # List to hold intake valve states for each cylinder
-        self.exhaust_valve_open = [False] * cylinders  # List to hold exhaust valve states for each cylinder
-        self.valve_timer = 0  # Timer for valve operation
-        self.valve_duration = 30  # Duration for which valves stay open
+        # Crank position, advanced by rpm every simulation step
+        self.time_step = 0.001  # Simulated seconds per simulate() call
+        self.crank_angle = 0.0  # Degrees, keeps increasing
+
+        # Ignition and disturbances (misfire, spark jitter, sensor noise), see Disturbances.py
+        self.ignition_module = IgnitionModule(cylinders)
+        self.disturbances = None
+        self.cylinder_efficiency = [1.0] * cylinders  # Torque share of each cylinder's last combustion
+        self.combustion_efficiency = 1.0  # Mean of cylinder_efficiency
+
+        # Spark and valve events driven by crank angle, see IgnitionScheduler.py
+        self.ignition_scheduler = IgnitionScheduler(cylinders, firing_order, spark_advance, on_spark=self.spark)
+        self.firing_order = self.ignition_scheduler.firing_order
+
+        # Oil pressure and friction losses, see Lubrication.py
+        self.lubrication = Lubrication()
+
+        # Optional exhaust gas-dynamics model (ExhaustGasDynamics.ExhaustPipe), sets volumetric efficiency
+        self.exhaust = None
+
+        # Optional engine control unit (ECU.ECU): idle-speed control and spark advance
+        self.ecu = None
+
+        # Optional telemetry recorder (TelemetryArchive.TelemetryWriter), gets every simulated step
+        self.telemetry = None
+
+        # Valve states, updated by the ignition scheduler
+        self.intake_valve_open = self.ignition_scheduler.intake_valve_open  # List to hold intake valve states for each cylinder
+        self.exhaust_valve_open = self.ignition_scheduler.exhaust_valve_open  # List to hold exhaust valve states for each cylinder
+
+        # Values reported by the rpm and temperature sensors
+        self.sensor_rpm = 0.0
+        self.sensor_temperature = self.normal_temperature
 
     def temperature(self):
         """Update the engine temperature based on RPM and throttle."""
@@ -33,11 +84,11 @@ class Engine:
         
         if self.rpm > 0:
             temperature_increase = self.rpm / 1000
-            self.cooling_rate = self.rpm / 1000 + 0.001
+            self.cooling_rate = self.rpm * self.cooling_per_rpm + self.cooling_offset
             if self.rpm > 799 and self.rpm < 2000:
-                self.cooling_rate -= 0.0095
+                self.cooling_rate -= self.idle_cooling_reduction
                 self.normal_temperature += temperature_increase
-                self.normal_temperature = 80
+                self.normal_temperature = self.warm_idle_temperature
         
         if self.normal_temperature >= self.max_temperature:
                 print("Warning: Engine overheating!")
@@ -49,6 +100,34 @@ class Engine:
         
 
 
+    def advance_temperature(self, ticks):
+        """Same as calling temperature() ticks times at constant rpm, in closed form (see EngineBatch.advance_temperature)."""
+        if not self.is_running or ticks <= 0:
+            return
+
+        idle_band = self.rpm > 799 and self.rpm < 2000
+        if self.rpm > 0:
+            self.cooling_rate = self.rpm * self.cooling_per_rpm + self.cooling_offset
+            if idle_band:
+                self.cooling_rate -= self.idle_cooling_reduction
+        cooling = self.cooling_rate
+
+        start = self.warm_idle_temperature if idle_band and self.rpm > 0 else self.normal_temperature
+        if start >= self.max_temperature:
+            print("Warning: Engine overheating!")
+            start = self.max_temperature
+        if start <= 30:
+            self.normal_temperature = start
+        elif idle_band and self.rpm > 0:
+            # Every tick resets to the warm temperature first
+            self.normal_temperature = start - cooling
+        elif cooling > 0:
+            # Falls until it is no longer above 30 °C
+            self.normal_temperature = start - min(ticks, math.ceil((start - 30) / cooling)) * cooling
+        else:
+            # Heats up to max_temperature, clamped at the start of every tick
+            self.normal_temperature = min(start - (ticks - 1) * cooling, self.max_temperature) - cooling
+
     def calculate_torque(self):
         """Calculate torque based on current RPM using a polynomial approximation."""
         if self.rpm < self.idle_rpm:
@@ -63,39 +142,161 @@ class Engine:
     def simulate(self, throttle):
         """Simulate engine performance based on throttle input."""
         if not self.is_running:
-            self.rpm, self.torque, self.power = 0.0, 0.0, 0.0
+            self.simulate_stopped(throttle)
             return
         
-        effective_throttle = min(max(throttle, 0), 1)
+        if self.ecu is not None:
+            throttle = self.ecu.update(self, throttle)
+        self.rpm += (self.target_rpm(throttle) - self.rpm) * 0.1
+        self.step(throttle)
+
+    def simulate_at_rpm(self, rpm, throttle, n_steps=1):
+        """
+        n_steps simulate() steps with the rpm imposed from outside, e.g. by a drivetrain with the clutch closed.
+        The torque curve is scaled by the throttle, as the engine is no longer free to rev.
+        rpm and throttle are held for all n_steps, which are taken as one jump (see step()) unless telemetry
+        needs every step recorded.
+        """
+        if not self.is_running or self.telemetry is not None:
+            for _ in range(n_steps):
+                if not self.is_running:
+                    self.simulate_stopped(throttle)
+                    continue
+                self.rpm = rpm
+                self.step(self.ecu.update(self, throttle) if self.ecu is not None else throttle, load=throttle)
+            return
 
-        throttle_response = effective_throttle ** 3
-        
-        if effective_throttle > 0:
-            target_rpm = min(self.idle_rpm + throttle_response * (self.max_power_rpm - self.idle_rpm), self.max_power_rpm)
-            self.rpm += (target_rpm - self.rpm) * 0.1  
+        if self.ecu is not None:
+            throttle = self.ecu.update(self, throttle, n_steps)
+        self.rpm = rpm
+        self.step(throttle, load=throttle, n_steps=n_steps)
+
+    def simulate_stopped(self, throttle):
+        self.rpm, self.torque, self.power = 0.0, 0.0, 0.0
+        self.indicated_torque, self.friction_torque = 0.0, 0.0
+        if self.disturbances is not None:
+            self.disturbances.next_tick()
+        self.read_sensors()
+        if self.telemetry is not None:
+            self.telemetry.record(self, throttle)
+
+    def step(self, throttle, load=1.0, n_steps=1):
+        """
+        Everything in a simulation step after the rpm update: crank events, torque, friction, temperature.
+        With n_steps > 1 the rpm is held for that many steps: every crank event is still processed,
+        temperature and oil temperature jump in closed form from their values at the start.
+        """
+        duration = self.time_step * n_steps
+        if self.disturbances is not None:
+            self.disturbances.skip(n_steps)
+
+        # Crank rotation, only the spark and valve events inside this step are processed
+        self.crank_angle += self.rpm * 6.0 * duration
+        self.ignition_scheduler.advance_to(self.crank_angle)
+
+        # Torque and power calculations, every torque multiplier is applied here
+        self.indicated_torque = self.calculate_torque() * load * self.combustion_efficiency
+        if self.ecu is not None:
+            self.indicated_torque *= self.ecu.spark_efficiency
+        if self.exhaust is not None:
+            self.exhaust.step(self, duration)
+            self.indicated_torque *= self.exhaust.volumetric_efficiency
+        if n_steps == 1:
+            self.lubrication.update(self.rpm, self.normal_temperature, self.time_step)
         else:
-            self.rpm += (self.idle_rpm - self.rpm) * 0.1
-        
-        # Torque and power calculations
-        self.torque = self.calculate_torque()
+            self.lubrication.advance(self.rpm, self.normal_temperature, self.time_step, n_steps)
+        self.friction_torque = self.lubrication.friction_torque(self.displacement)
+        self.torque = self.indicated_torque - self.friction_torque
         omega = (self.rpm * (math.pi / 30))  
         self.power = (self.torque * omega) / 1000  
-
-        if self.rpm > 1000:  
-            self.valve_timer += 1
-            
-            for i in range(self.cylinders):
-                if (self.valve_timer // (self.valve_duration // len(self.intake_valve_open))) % len(self.intake_valve_open) == i:
-                    self.intake_valve_open[i] = True
-                else:
-                    self.intake_valve_open[i] = False
-                
-                if (self.valve_timer // (self.valve_duration // len(self.exhaust_valve_open))) % len(self.exhaust_valve_open) == i:
-                    self.exhaust_valve_open[i] = True
-                else:
-                    self.exhaust_valve_open[i] = False
         
-        self.temperature()
+        if n_steps == 1:
+            self.temperature()
+        else:
+            self.advance_temperature(n_steps)
+        self.read_sensors()
+        if self.telemetry is not None:
+            self.telemetry.record(self, throttle)
+
+    def target_rpm(self, throttle):
+        """RPM the engine settles at for a constant throttle."""
+        effective_throttle = min(max(throttle, 0), 1)
+
+        throttle_response = effective_throttle ** 3
+
+        if effective_throttle > 0:
+            return min(self.idle_rpm + throttle_response * (self.max_power_rpm - self.idle_rpm), self.max_power_rpm)
+        return self.idle_rpm
+
+    def advance(self, throttle, n_steps):
+        """
+        Same as calling simulate(throttle) n_steps times, for headless runs.
+        Steps only until the operating point has settled, then jumps the rest in closed form.
+        """
+        while n_steps > 0:
+            previous_temperature = self.normal_temperature
+            self.simulate(throttle)
+            n_steps -= 1
+            if n_steps > 0 and self.is_steady(throttle, previous_temperature):
+                self.skip(throttle, n_steps)
+                return
+
+    def is_steady(self, throttle, previous_temperature):
+        """
+        True when further simulate(throttle) calls would only move rpm towards its target and keep the temperature.
+        Disturbances, the exhaust model, the ECU, telemetry and cylinders still recovering from a misfire keep the engine stepping.
+        """
+        # Per-tick streams come first: even a stopped engine draws sensor noise and records samples every tick
+        if self.telemetry is not None or self.disturbances is not None:
+            return False
+        if not self.is_running:
+            return True
+        if self.exhaust is not None or self.ecu is not None or min(self.cylinder_efficiency) < 1.0:
+            return False
+        target_rpm = self.target_rpm(throttle)
+        return abs(target_rpm - self.rpm) <= STEADY_RPM_TOLERANCE * target_rpm and self.normal_temperature == previous_temperature
+
+    def skip(self, throttle, n_steps):
+        """Jump n_steps simulate(throttle) calls ahead from a steady operating point, see is_steady()."""
+        if not self.is_running:
+            self.simulate(throttle)
+            return
+
+        # rpm closes 10 % of the gap every step, the crank turns by the sum of a geometric series
+        target_rpm = self.target_rpm(throttle)
+        gap = self.rpm - target_rpm
+        remaining = 0.9 ** n_steps
+        self.crank_angle += self.time_step * 6.0 * (n_steps * target_rpm + gap * 9.0 * (1 - remaining))
+        self.rpm = target_rpm + gap * remaining
+
+        # Whole cycles are skipped without visiting their events; every cylinder fires once per cycle
+        cycles = self.ignition_scheduler.skip_to(self.crank_angle)
+        self.ignition_module.spark_count += cycles * self.cylinders
+
+        # The temperature is at its fixed point, only the oil is still following it
+        self.indicated_torque = self.calculate_torque() * self.combustion_efficiency
+        self.lubrication.advance(self.rpm, self.normal_temperature, self.time_step, n_steps)
+        self.friction_torque = self.lubrication.friction_torque(self.displacement)
+        self.torque = self.indicated_torque - self.friction_torque
+        self.power = (self.torque * self.rpm * (math.pi / 30)) / 1000
+        self.read_sensors()
+
+    def spark(self, cylinder):
+        """Fire one cylinder, called by the ignition scheduler at its spark event."""
+        self.ignition_module.fire(cylinder)
+        efficiency = 1.0
+        if self.disturbances is not None:
+            efficiency = self.disturbances.cylinder_efficiency(cylinder)
+        self.combustion_efficiency += (efficiency - self.cylinder_efficiency[cylinder]) / self.cylinders
+        self.cylinder_efficiency[cylinder] = efficiency
+
+    def read_sensors(self):
+        """Update the rpm and temperature reported by the sensors."""
+        self.sensor_rpm = self.rpm
+        self.sensor_temperature = self.normal_temperature
+        if self.disturbances is not None:
+            self.sensor_rpm = max(self.rpm + self.disturbances.rpm_error(), 0.0)
+            self.sensor_temperature += self.disturbances.temperature_error()
 
     def start(self):
         """Start the engine."""
@@ -116,7 +317,7 @@ def draw_metrics(screen, engine, throttle):
     font = pygame.font.Font(None, 36)
 
     metrics_texts = [
-        f"RPM: {engine.rpm:.2f}",
+        f"RPM: {engine.sensor_rpm:.2f}",
         f"Torque: {engine.torque:.2f} Nm",
         f"Power: {engine.power:.2f} kW",
         f"Throttle: {throttle:.2f}",
@@ -129,7 +330,7 @@ def draw_metrics(screen, engine, throttle):
 
     pygame.draw.rect(screen, (0, 255, 0), (50, 250, throttle * 300, 20)) 
 
-    instructions_text = font.render("Press 'S' to Start | 'O' to Stop | UP to Throttle", True, (255,255 ,255))
+    instructions_text = font.render("'S' Start | 'O' Stop | UP Throttle | 'H' Chart history", True, (255,255 ,255))
     screen.blit(instructions_text, (50,280))
 
 def draw_gauge(screen, engine):
@@ -137,10 +338,10 @@ def draw_gauge(screen, engine):
     gauge_x = screen.get_width() - 150
     gauge_y = screen.get_height() // 2 - 50
     pygame.draw.rect(screen, (200,200,200), (gauge_x -10, gauge_y -10, 20, 110))   # Gauge outline
-    current_temp_height = int((engine.normal_temperature / engine.max_temperature) * 100)
+    current_temp_height = int(min(max(engine.sensor_temperature / engine.max_temperature, 0.0), 1.0) * 100)
     pygame.draw.rect(screen,(255 - current_temp_height*2.55, current_temp_height*2.55, 0),
     (gauge_x -5 , gauge_y + (100 - current_temp_height),10,current_temp_height))   # Temperature bar
-    temp_label_text = f"{engine.normal_temperature:.1f} °C"
+    temp_label_text = f"{engine.sensor_temperature:.1f} °C"
     font = pygame.font.Font(None,36)
     rendered_label_text = font.render(temp_label_text ,True,(255 ,255 ,255))
     screen.blit(rendered_label_text ,(gauge_x -40 ,gauge_y +120))
@@ -173,11 +374,11 @@ def draw_engine_visual(screen, engine):
     crank_angle_per_revolution = engine.rpm / 60 * (360 / engine.cylinders)   
     current_angle = pygame.time.get_ticks() * (engine.rpm / engine.max_power_rpm) % 360
 
-    firing_ignition_order = [i for i in range(engine.cylinders)]
+    firing_ignition_order = engine.firing_order
 
-    for i in firing_ignition_order:
+    for position, i in enumerate(firing_ignition_order):
         
-        angle_offset = i * crank_angle_per_revolution + current_angle
+        angle_offset = position * crank_angle_per_revolution + current_angle
         
         piston_base_height = int(30)
         
@@ -206,53 +407,98 @@ def draw_engine_visual(screen, engine):
         if engine.exhaust_valve_open[i]:
             draw_camshaftlobe(screen,(200 ,50 ,50), center_x + valve_positions_exhaust[i] +7 , center_y -55-12 ,5)  
 
+def create_charts(screen, top, span):
+    """
+    Scrolling history charts for rpm, torque, power and temperature along the bottom of the screen.
+    span is the number of samples shown, None to show the whole run.
+    """
+    channels = [
+        ("RPM", "rpm", (80, 160, 255)),
+        ("Torque", "Nm", (255, 170, 60)),
+        ("Power", "kW", (120, 220, 120)),
+        ("Temp", "°C", (255, 90, 90)),
+    ]
+    width = (screen.get_width() - 10) // len(channels) - 10
+    height = screen.get_height() - top - 10
+    return [StripChart(label, unit, (10 + i * (width + 10), top, width, height), color, span)
+            for i, (label, unit, color) in enumerate(channels)]
+
+def draw_charts(screen, charts, font):
+    """Draw the history charts."""
+    for chart in charts:
+        chart.draw(screen, font)
+
+def draw_rates(screen, simulation, render_rate, font):
+    """Draw how fast the simulation and render loops are running."""
+    text = f"sim {simulation.simulation_rate.rate:.0f} Hz | render {render_rate.rate:.0f} fps | dropped {simulation.dropped_ticks}"
+    rendered_text = font.render(text, True, (180, 180, 180))
+    screen.blit(rendered_text, (screen.get_width() - rendered_text.get_width() - 10, 10))
+
 def main():
     pygame.init()
     
-    screen_width, screen_height = 800,400
+    screen_width, screen_height = 800,640
     screen = pygame.display.set_mode((screen_width,screen_height))
     pygame.display.set_caption("Engine Simulator")
 
-    global engine 
-    engine = Engine()
-    
-    throttle = 0.0
+    global engine
+    if len(sys.argv) > 1:
+        # Engine definition file (TOML/JSON), see engines/
+        from EngineConfig import load_engine
+        engine = load_engine(sys.argv[1])
+    else:
+        engine = Engine()
+
+    # The last CHART_SECONDS scroll by, 'H' toggles the whole run
+    chart_span = int(CHART_SECONDS / engine.time_step)
+    charts = create_charts(screen, top=420, span=chart_span)
+    chart_font = pygame.font.Font(None, 20)
+
+    # Physics runs on its own thread at a fixed rate, this loop only draws the latest snapshot
+    simulation = SimulationThread(engine)
+    simulation.start()
+    render_rate = RateMeter()
+    clock = pygame.time.Clock()
 
     while True:
         
        for event in pygame.event.get():
            if event.type == pygame.QUIT:
+               simulation.shutdown()
                pygame.quit()
                sys.exit()
+           if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+               for chart in charts:
+                   chart.span = None if chart.span is not None else chart_span
 
        keys = pygame.key.get_pressed()
 
        if keys[pygame.K_s]:
-           engine.start()  
+           simulation.start_engine()
        
        if keys[pygame.K_o]:
-           engine.stop()  
-       
-       if keys[pygame.K_UP]:
-           throttle += 0.00035  
-           throttle = min(throttle,1.0) 
+           simulation.stop_engine()
        
-       elif not keys[pygame.K_UP] and throttle > 0.0:
-           throttle -= 0.00035  
-           throttle = max(throttle,0.0) 
-       
-       engine.simulate(throttle)
+       simulation.throttle_up = keys[pygame.K_UP]
 
-       engine.temperature()
+       snapshot = simulation.latest()
        
-       draw_metrics(screen, engine, throttle)
+       draw_metrics(screen, snapshot, snapshot.throttle)
        
-       draw_engine_visual(screen, engine)
+       draw_engine_visual(screen, snapshot)
+
+       draw_gauge(screen, snapshot)
 
-       draw_gauge(screen, engine)
+       for sample in simulation.drain_samples():
+           for chart, value in zip(charts, sample):
+               chart.append(value)
+       draw_charts(screen, charts, chart_font)
 
+       draw_rates(screen, simulation, render_rate, chart_font)
        
        pygame.display.flip()  
+       render_rate.tick()
+       clock.tick(120)
 
 if __name__ == "__main__":
    main()
\ No newline at end of file
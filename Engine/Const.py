@@ -7,4 +7,7 @@ class Const:
      power_starter = 1.0 #кВт
      power_generator = 700.0 #Вт
      battery_charge = 40.0 #Ач
-     octane = 95.0 
\ No newline at end of file
+     octane = 95.0 
+     fuel_density = 0.745 #кг/л
+     fuel_heating_value = 43.4 #МДж/кг
+     fuel_pump_flow = 40.0 #г/с
\ No newline at end of file
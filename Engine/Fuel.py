@@ -1,5 +1,7 @@
-import Const
+from Const import Const
 
 class Fuel:
     def __init__(self):
         self.octane = Const.octane  
+        self.density = Const.fuel_density # Плотность, кг/л
+        self.heating_value = Const.fuel_heating_value # Теплота сгорания, МДж/кг
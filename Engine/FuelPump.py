@@ -1,5 +1,12 @@
-import Const
+from Const import Const
 
 class FuelPump:
     def __init__(self):
         self.pressure_pump = Const.pressure_pump
+        self.max_flow = Const.fuel_pump_flow # Максимальная подача, г/с
+
+    def deliver(self, demand):
+        """
+        Подача топлива, г/с: сколько запрошено, но не больше производительности насоса
+        """
+        return min(demand, self.max_flow)
@@ -1,9 +1,27 @@
-import Const
+import numpy as np
+
+from Const import Const
 
 class IgnitionModule:
     def __init__(self, cylinder_counter):
         self.cylinder_counter = cylinder_counter
         self.output_voltage = Const.output_voltage_ignition_coil
+        self.spark_plugs = [SparkPlug() for _ in range(cylinder_counter)]
+        self.spark_loss = 0.0003 # Потеря момента на градус^2 отклонения искры
+        self.current_cylinder = 0 # Цилиндр последней искры
+        self.spark_count = 0
+
+    def fire(self, cylinder):
+        self.current_cylinder = cylinder
+        self.spark_count += 1
+
+    def combustion_efficiency(self, misfire, jitter):
+        """
+        Доля момента, которую дает каждый цилиндр.
+        misfire и jitter - массивы (такты, цилиндры): пропуски зажигания и отклонение искры в градусах
+        """
+        efficiency = np.where(misfire, 0.0, np.clip(1 - self.spark_loss * jitter ** 2, 0.0, 1.0))
+        return efficiency
 
 class SparkPlug:
     def __init__(self):
@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+
+from Lubrication import Lubrication
+
+# Engine attributes that may differ between the variants of a batch
+PARAMETERS = (
+    "displacement", "idle_rpm", "max_torque", "peak_torque_rpm", "max_power_rpm",
+    "normal_temperature", "max_temperature", "cooling_rate", "time_step",
+    "cooling_per_rpm", "cooling_offset", "idle_cooling_reduction", "warm_idle_temperature",
+)
+
+
+class EngineBatch:
+    """
+    Many running Engine variants stepped together, every parameter and state is an array over variants.
+    Mirrors Engine.simulate without ignition events, disturbances or the exhaust model.
+    """
+
+    def __init__(self, size, lubrication=None, **parameters):
+        missing = [name for name in PARAMETERS if name not in parameters]
+        if missing:
+            raise ValueError(f"EngineBatch is missing parameters: {', '.join(missing)}")
+        self.size = size
+        for name in PARAMETERS:
+            setattr(self, name, np.broadcast_to(np.asarray(parameters[name], dtype=float), (size,)).copy())
+
+        self.lubrication = lubrication or Lubrication()
+        self.oil_temperature = np.full(size, self.lubrication.oil_temperature)
+
+        self.rpm = self.idle_rpm.copy()
+        self.indicated_torque = np.zeros(size)
+        self.friction_torque = np.zeros(size)
+        self.torque = np.zeros(size)
+        self.power = np.zeros(size)
+
+    @staticmethod
+    def engine_parameters(engine):
+        """Parameters of a single Engine, to be broadcast or varied across a batch."""
+        return {name: getattr(engine, name) for name in PARAMETERS}
+
+    @classmethod
+    def from_engine(cls, engine, size, **overrides):
+        parameters = cls.engine_parameters(engine)
+        parameters.update(overrides)
+        return cls(size, **parameters)
+
+    def calculate_torque(self):
+        """Engine.calculate_torque for every variant."""
+        rising = (self.max_torque / self.peak_torque_rpm) * self.rpm
+        falling = self.max_torque - (self.max_torque / (self.max_power_rpm - self.peak_torque_rpm)) * (self.rpm - self.peak_torque_rpm)
+        torque = np.where(self.rpm <= self.peak_torque_rpm, rising, falling)
+        return np.where((self.rpm < self.idle_rpm) | (self.rpm > self.max_power_rpm), 0.0, torque)
+
+    def calculate_torque_at(self, rpm):
+        """Torque curve of every variant (rows) at an array of rpm values (columns)."""
+        rpm = np.asarray(rpm, dtype=float)[None, :]
+        max_torque, peak, max_power, idle = (value[:, None] for value in (self.max_torque, self.peak_torque_rpm, self.max_power_rpm, self.idle_rpm))
+        rising = (max_torque / peak) * rpm
+        falling = max_torque - (max_torque / (max_power - peak)) * (rpm - peak)
+        torque = np.where(rpm <= peak, rising, falling)
+        return np.where((rpm < idle) | (rpm > max_power), 0.0, torque)
+
+    def temperature(self):
+        """Engine.temperature for every variant."""
+        self.advance_temperature(1)
+
+    def advance_temperature(self, ticks):
+        """
+        Same result as calling temperature() ticks times (scalar or per variant) at constant rpm, in closed form.
+        Between 800 and 2000 rpm every tick resets to the warm temperature, elsewhere the temperature
+        falls by cooling_rate per tick until it is no longer above 30 °C.
+        """
+        ticks = np.broadcast_to(np.asarray(ticks), (self.size,))
+        stepping = ticks > 0
+        turning = self.rpm > 0
+        idle_band = turning & (self.rpm > 799) & (self.rpm < 2000)
+
+        cooling = np.where(turning, self.rpm * self.cooling_per_rpm + self.cooling_offset, self.cooling_rate)
+        cooling = np.where(idle_band, cooling - self.idle_cooling_reduction, cooling)
+        self.cooling_rate = np.where(stepping, cooling, self.cooling_rate)
+
+        start = np.minimum(np.where(idle_band, self.warm_idle_temperature, self.normal_temperature), self.max_temperature)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Ticks until the temperature is no longer above 30 °C
+            needed = np.where(cooling > 0, np.ceil((start - 30) / cooling), np.inf)
+        applied = np.where(idle_band, 1, np.minimum(ticks, needed))
+        cooled = start - applied * cooling
+        # Negative cooling heats up to max_temperature, clamped at the start of every tick
+        heated = np.minimum(start - (ticks - 1) * cooling, self.max_temperature) - cooling
+        advanced = np.where(cooling > 0, cooled, np.where(idle_band, start - cooling, heated))
+        self.normal_temperature = np.where(stepping & (start > 30), advanced, np.where(stepping, start, self.normal_temperature))
+
+    def simulate(self, throttle):
+        """Engine.simulate for every variant; throttle is a scalar or an array over variants."""
+        throttle_response = np.clip(throttle, 0.0, 1.0) ** 3
+        target_rpm = np.minimum(self.idle_rpm + throttle_response * (self.max_power_rpm - self.idle_rpm), self.max_power_rpm)
+        self.rpm += (target_rpm - self.rpm) * 0.1
+
+        self.indicated_torque = self.calculate_torque()
+
+        # Same oil model as Lubrication.update, one table lookup for the whole batch
+        oil_target = self.normal_temperature + self.rpm / 1000 * 2.0
+        self.oil_temperature += (oil_target - self.oil_temperature) * np.minimum(self.time_step / self.lubrication.oil_time_constant(), 1.0)
+        _, fmep = self.lubrication.lookup_arrays(self.rpm, self.oil_temperature)
+        self.friction_torque = fmep * 1e5 * self.displacement * 1e-3 / (4 * math.pi)
+
+        self.torque = self.indicated_torque - self.friction_torque
+        self.power = self.torque * self.rpm * (math.pi / 30) / 1000
+        self.temperature()
@@ -0,0 +1,131 @@
+"""
+Declarative TOML/JSON engine definitions, validated against FIELDS and loaded into Engine objects.
+Derived quantities (the stroke) are computed on load rather than cached on disk: rebuilding them is
+faster than reading a cache file.
+"""
+import json
+import math
+import os
+import sys
+import tomllib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from Const import Const
+
+# name: (type, default, minimum, maximum); default None means the key is required
+FIELDS = {
+    "name": (str, None, None, None),
+    "cylinders": (int, 4, 1, 16),
+    "displacement": (float, 2.0, 0.05, 20.0),  # liters
+    "bore": (float, Const.diameter, 10.0, 300.0),  # mm
+    "idle_rpm": (float, 800.0, 100.0, 5000.0),
+    "max_torque": (float, 400.0, 1.0, 10000.0),  # Nm
+    "peak_torque_rpm": (float, 5000.0, 100.0, 20000.0),
+    "max_power_rpm": (float, 6000.0, 100.0, 20000.0),
+    "normal_temperature": (float, 30.0, -40.0, 150.0),  # °C
+    "max_temperature": (float, 120.0, 0.0, 200.0),  # °C
+    "cooling_rate": (float, 1.5, 0.0, 100.0),
+    "cooling_per_rpm": (float, 0.001, 0.0, 0.1),
+    "cooling_offset": (float, 0.001, 0.0, 10.0),
+    "idle_cooling_reduction": (float, 0.0095, 0.0, 10.0),
+    "warm_idle_temperature": (float, 80.0, 0.0, 200.0),  # °C
+    "spark_advance": (float, 10.0, -10.0, 60.0),  # degrees before TDC
+    "firing_order": (list, [], None, None),  # cylinders counted from 1, empty for the default order
+    "oil_pan_volume": (float, 4.0, 0.5, 30.0),  # liters
+}
+
+
+def read_definition(path):
+    """Read a TOML or JSON engine definition file into a dict."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as file:
+        if extension == ".toml":
+            return tomllib.load(file)
+        if extension == ".json":
+            return json.load(file)
+    raise ValueError(f"{path}: unsupported engine definition format '{extension}'")
+
+
+def validate(definition, source="engine definition"):
+    """Check types and ranges, fill in defaults and return a normalized definition."""
+    errors = []
+    normalized = {}
+
+    for key in definition:
+        if key not in FIELDS:
+            errors.append(f"unknown key '{key}'")
+
+    for key, (kind, default, minimum, maximum) in FIELDS.items():
+        value = definition.get(key, default)
+        if value is None:
+            errors.append(f"missing required key '{key}'")
+            continue
+        # bool is an int subclass, but "cylinders = true" is never what was meant
+        if isinstance(value, bool) or not isinstance(value, (kind, int) if kind is float else kind):
+            errors.append(f"'{key}' must be {kind.__name__}, got {type(value).__name__}")
+            continue
+        value = kind(value)
+        if minimum is not None and not minimum <= value <= maximum:
+            errors.append(f"'{key}' = {value} is outside [{minimum}, {maximum}]")
+            continue
+        normalized[key] = value
+
+    if not errors:
+        if not normalized["idle_rpm"] < normalized["peak_torque_rpm"] < normalized["max_power_rpm"]:
+            errors.append("rpm points must satisfy idle_rpm < peak_torque_rpm < max_power_rpm")
+        if normalized["normal_temperature"] >= normalized["max_temperature"]:
+            errors.append("normal_temperature must be below max_temperature")
+        firing_order = normalized["firing_order"]
+        if firing_order and (not all(type(cylinder) is int for cylinder in firing_order)
+                             or sorted(firing_order) != list(range(1, normalized["cylinders"] + 1))):
+            errors.append("firing_order must list every cylinder from 1 to cylinders exactly once")
+
+    if errors:
+        raise ValueError(f"{source}: " + "; ".join(errors))
+    return normalized
+
+
+def stroke(definition):
+    """Stroke in mm from displacement, bore and cylinder count."""
+    displacement_per_cylinder = definition["displacement"] * 1e6 / definition["cylinders"]  # mm^3
+    return displacement_per_cylinder / (math.pi / 4 * definition["bore"] ** 2)
+
+
+def load_engine(path):
+    """Build an Engine from a definition file."""
+    from Engine import Engine
+
+    definition = validate(read_definition(path), source=path)
+
+    firing_order = [cylinder - 1 for cylinder in definition["firing_order"]] or None
+    engine = Engine(cylinders=definition["cylinders"], displacement=definition["displacement"], idle_rpm=definition["idle_rpm"],
+                    firing_order=firing_order, spark_advance=definition["spark_advance"])
+    engine.name = definition["name"]
+    engine.bore = definition["bore"]
+    engine.stroke = stroke(definition)
+    engine.max_torque = definition["max_torque"]
+    engine.peak_torque_rpm = definition["peak_torque_rpm"]
+    engine.max_power_rpm = definition["max_power_rpm"]
+    engine.normal_temperature = definition["normal_temperature"]
+    engine.max_temperature = definition["max_temperature"]
+    engine.cooling_rate = definition["cooling_rate"]
+    engine.cooling_per_rpm = definition["cooling_per_rpm"]
+    engine.cooling_offset = definition["cooling_offset"]
+    engine.idle_cooling_reduction = definition["idle_cooling_reduction"]
+    engine.warm_idle_temperature = definition["warm_idle_temperature"]
+    engine.lubrication.oil_pan.volume_oil_pan = definition["oil_pan_volume"]
+    return engine
+
+
+def load_engines(directory):
+    """Load every engine definition in a directory, keyed by engine name."""
+    engines = {}
+    for filename in sorted(os.listdir(directory)):
+        if os.path.splitext(filename)[1].lower() not in (".toml", ".json"):
+            continue
+        engine = load_engine(os.path.join(directory, filename))
+        if engine.name in engines:
+            raise ValueError(f"{filename}: duplicate engine name '{engine.name}'")
+        engines[engine.name] = engine
+    return engines
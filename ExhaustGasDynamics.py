@@ -0,0 +1,188 @@
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from ExhaustSystem import ExhaustSystem
+
+GAMMA = 1.35  # Exhaust gas heat capacity ratio
+GAS_CONSTANT = 287.0  # J/(kg K)
+AMBIENT_PRESSURE = 101325.0  # Pa
+AMBIENT_TEMPERATURE = 300.0  # K
+EXHAUST_TEMPERATURE = 900.0  # K, gas leaving the cylinder
+
+# Grid sizes: coarse for the interactive simulator, fine for offline studies.
+# The CFL limit sets the sub-steps per engine tick (about 5 at 6 cells on a 1 m pipe, 14 at 16), and each
+# sub-step is a fixed ~30 us of numpy calls, so 6 cells costs about 170 us of the 1000 us tick budget.
+# The volumetric efficiency stays within about 0.02 of the 16-cell result across pipe lengths.
+COARSE_CELLS = 6
+FINE_CELLS = 200
+
+
+class ExhaustPipe:
+    """
+    1-D finite-volume model of the exhaust pipe (Euler equations, Rusanov flux).
+    Cylinders blow down into the first cell, the last cell opens to the atmosphere.
+    The pressure at the port during valve overlap sets the volumetric efficiency.
+    Cost per engine tick grows with cells / length, see COARSE_CELLS.
+    """
+
+    def __init__(self, exhaust_system, cells=COARSE_CELLS, diameter=0.045, cfl=0.8, scavenging_gain=0.5):
+        self.exhaust_system = exhaust_system
+        self.length = exhaust_system.length_exhaust_system  # m
+        self.cells = cells
+        self.dx = self.length / cells
+        self.area = math.pi / 4 * diameter ** 2  # m^2
+        self.cfl = cfl
+        self.scavenging_gain = scavenging_gain  # Volumetric efficiency change per unit of relative port depression
+
+        # Conserved variables per cell: density, momentum, total energy (per unit pipe area)
+        ambient_density = AMBIENT_PRESSURE / (GAS_CONSTANT * AMBIENT_TEMPERATURE)
+        ambient = np.array([ambient_density, 0.0, AMBIENT_PRESSURE / (GAMMA - 1)])
+        self.state = np.repeat(ambient[:, None], cells, axis=1)
+        self.extended = np.empty((3, cells + 2))
+        self.flux = np.empty((3, cells + 2))
+        self.substeps = 0  # CFL sub-steps taken so far
+
+        # Gas left in each cylinder after its exhaust valve opens, per unit pipe area
+        self.cylinder_length = 0.0  # Cylinder volume / pipe area, m
+        self.cylinder_mass = []  # kg/m^2
+        self.cylinder_pressure = []  # Pa
+        self.exhaust_was_open = []
+        self.volumetric_efficiency = 1.0
+
+    @classmethod
+    def for_length(cls, length, cells=COARSE_CELLS, **settings):
+        return cls(ExhaustSystem(length_exhaust_system=length), cells, **settings)
+
+    def pressures(self):
+        """Static pressure of every cell in Pa."""
+        density, momentum, energy = self.state
+        return (GAMMA - 1) * (energy - 0.5 * momentum ** 2 / density)
+
+    def port_pressure(self):
+        density, momentum, energy = self.state[:, 0]
+        return (GAMMA - 1) * (energy - 0.5 * momentum ** 2 / density)
+
+    def open_cylinder(self, engine):
+        """Start a blowdown when an exhaust valve opens; return the open cylinder with the highest pressure."""
+        if len(self.cylinder_mass) != engine.cylinders:
+            self.cylinder_length = engine.displacement * 1e-3 / engine.cylinders / self.area
+            self.cylinder_pressure = [AMBIENT_PRESSURE] * engine.cylinders
+            self.cylinder_mass = [AMBIENT_PRESSURE * self.cylinder_length / (GAS_CONSTANT * EXHAUST_TEMPERATURE)] * engine.cylinders
+            self.exhaust_was_open = [False] * engine.cylinders
+
+        # Pressure at exhaust valve opening grows with load
+        load = min(max(engine.indicated_torque / engine.max_torque, 0.0), 1.0)
+        blowdown_pressure = AMBIENT_PRESSURE * (1.5 + 3.5 * load)
+
+        active = None
+        for cylinder, is_open in enumerate(engine.exhaust_valve_open):
+            if is_open and not self.exhaust_was_open[cylinder]:
+                self.cylinder_pressure[cylinder] = blowdown_pressure
+                self.cylinder_mass[cylinder] = blowdown_pressure * self.cylinder_length / (GAS_CONSTANT * EXHAUST_TEMPERATURE)
+            self.exhaust_was_open[cylinder] = is_open
+            if is_open and (active is None or self.cylinder_pressure[cylinder] > self.cylinder_pressure[active]):
+                active = cylinder
+        return active
+
+    def advance(self, dt, cylinder):
+        """
+        Integrate the pipe for dt seconds in CFL-limited sub-steps, each one array update over all cells.
+        Sub-steps per call are about dt * 900 m/s / (cfl * dx), roughly 30 us each.
+        cylinder is the one blowing into the port, None when every exhaust valve is shut.
+        """
+        elapsed = 0.0
+        # State with the inlet and outlet ghost cells, and the flux arrays, reused by every sub-step
+        extended = self.extended
+        flux = self.flux
+        ambient_density = AMBIENT_PRESSURE / (GAS_CONSTANT * AMBIENT_TEMPERATURE)
+        while elapsed < dt:
+            extended[:, 1:-1] = self.state
+            if cylinder is None:
+                # Closed port: mirror the first cell as a wall
+                extended[0, 0], extended[1, 0], extended[2, 0] = self.state[0, 0], -self.state[1, 0], self.state[2, 0]
+            else:
+                # Open port: the cylinder gas at rest
+                extended[0, 0] = self.cylinder_mass[cylinder] / self.cylinder_length
+                extended[1, 0] = 0.0
+                extended[2, 0] = self.cylinder_pressure[cylinder] / (GAMMA - 1)
+
+            # Open end: ambient pressure, velocity from the last cell, outflow keeps the pipe gas entropy
+            density, momentum, energy = self.state[:, -1].tolist()
+            velocity = momentum / density
+            if velocity > 0:
+                last_pressure = max((GAMMA - 1) * (energy - 0.5 * momentum * velocity), 1.0)
+                outlet_density = density * (AMBIENT_PRESSURE / last_pressure) ** (1 / GAMMA)
+            else:
+                outlet_density = ambient_density
+            extended[0, -1] = outlet_density
+            extended[1, -1] = outlet_density * velocity
+            extended[2, -1] = AMBIENT_PRESSURE / (GAMMA - 1) + 0.5 * outlet_density * velocity ** 2
+
+            density, momentum, energy = extended
+            velocity = momentum / density
+            pressure = np.maximum((GAMMA - 1) * (energy - 0.5 * momentum * velocity), 1.0)
+            flux[0] = momentum
+            np.multiply(momentum, velocity, out=flux[1])
+            flux[1] += pressure
+            np.add(energy, pressure, out=flux[2])
+            flux[2] *= velocity
+
+            wave_speed = np.abs(velocity) + np.sqrt(GAMMA * pressure / density)
+            interface_speed = np.maximum(wave_speed[:-1], wave_speed[1:])
+            interface_flux = 0.5 * (flux[:, :-1] + flux[:, 1:] - interface_speed * np.diff(extended, axis=1))
+
+            step = min(self.cfl * self.dx / interface_speed.max(), dt - elapsed)
+            self.state -= (step / self.dx) * np.diff(interface_flux, axis=1)
+            np.maximum(self.state[0], 1e-3, out=self.state[0])
+            elapsed += step
+            self.substeps += 1
+
+            if cylinder is not None:
+                # The cylinder empties (or takes back gas) through the port, expanding isentropically
+                mass = max(self.cylinder_mass[cylinder] - interface_flux[0, 0] * step, 1e-6)
+                self.cylinder_pressure[cylinder] *= (mass / self.cylinder_mass[cylinder]) ** GAMMA
+                self.cylinder_mass[cylinder] = mass
+
+    def step(self, engine, dt):
+        """Advance the pipe by one engine step and update the volumetric efficiency."""
+        self.advance(dt, self.open_cylinder(engine))
+
+        # Only the pressure at the port while a cylinder is in valve overlap matters for scavenging
+        overlap = any(intake and exhaust for intake, exhaust in zip(engine.intake_valve_open, engine.exhaust_valve_open))
+        if overlap:
+            depression = (AMBIENT_PRESSURE - self.port_pressure()) / AMBIENT_PRESSURE
+            target = min(max(1.0 + self.scavenging_gain * depression, 0.7), 1.3)
+            self.volumetric_efficiency += (target - self.volumetric_efficiency) * 0.2
+
+
+def volumetric_efficiency_sweep(lengths, rpm, cells=FINE_CELLS, seconds=0.3):
+    """Mean volumetric efficiency at a fixed rpm for each exhaust length, for offline header tuning."""
+    from Engine import Engine
+
+    results = []
+    for length in lengths:
+        engine = Engine()
+        engine.exhaust = ExhaustPipe.for_length(length, cells)
+        engine.is_running = True
+        engine.rpm = rpm
+        # Throttle whose steady-state rpm is the requested one
+        throttle = ((rpm - engine.idle_rpm) / (engine.max_power_rpm - engine.idle_rpm)) ** (1 / 3)
+        steps = int(seconds / engine.time_step)
+        total = 0.0
+        for step in range(steps):
+            engine.simulate(throttle)
+            if step >= steps // 2:
+                total += engine.exhaust.volumetric_efficiency
+        results.append((length, total / (steps - steps // 2)))
+    return results
+
+
+if __name__ == "__main__":
+    rpm = float(sys.argv[1]) if len(sys.argv) > 1 else 4000.0
+    for length, efficiency in volumetric_efficiency_sweep([0.4, 0.6, 0.8, 1.0, 1.2, 1.5], rpm):
+        print(f"{length:5.2f} m  VE {efficiency:.3f}")
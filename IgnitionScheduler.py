@@ -0,0 +1,113 @@
+import heapq
+
+# Four-stroke cycle in crank degrees
+CYCLE = 720.0
+
+# Event kinds
+SPARK = 0
+EXHAUST_OPEN = 1
+EXHAUST_CLOSE = 2
+INTAKE_OPEN = 3
+INTAKE_CLOSE = 4
+
+# Valve timing in crank degrees after the cylinder's firing TDC
+VALVE_TIMING = {
+    EXHAUST_OPEN: 140.0,  # 40° before bottom dead centre
+    INTAKE_OPEN: 350.0,  # 10° before overlap TDC
+    EXHAUST_CLOSE: 370.0,  # 10° after overlap TDC
+    INTAKE_CLOSE: 580.0,  # 40° after bottom dead centre
+}
+
+# Common firing orders, cylinders counted from 0
+FIRING_ORDERS = {
+    1: [0],
+    2: [0, 1],
+    3: [0, 2, 1],
+    4: [0, 2, 3, 1],
+    5: [0, 1, 3, 4, 2],
+    6: [0, 4, 2, 5, 1, 3],
+    8: [0, 7, 6, 1, 5, 4, 3, 2],
+}
+
+
+class IgnitionScheduler:
+    """
+    Spark and valve events kept in a heap ordered by crank angle.
+    Each step only pops the events that fall inside it, so the cost follows the event rate.
+    """
+
+    def __init__(self, cylinders, firing_order=None, spark_advance=10.0, on_spark=None):
+        self.cylinders = cylinders
+        self.firing_order = list(firing_order) if firing_order is not None else FIRING_ORDERS.get(cylinders, list(range(cylinders)))
+        if sorted(self.firing_order) != list(range(cylinders)):
+            raise ValueError(f"firing order {self.firing_order} does not list each of {cylinders} cylinders once")
+        self.spark_advance = spark_advance  # Degrees before TDC
+        self.on_spark = on_spark  # Called with the cylinder number at every spark
+
+        self.intake_valve_open = [False] * cylinders
+        self.exhaust_valve_open = [False] * cylinders
+        self.crank_angle = 0.0
+        self.events = []
+        self.reset(0.0)
+
+    def reset(self, crank_angle):
+        """Rebuild the queue with the first event of every kind after crank_angle."""
+        self.crank_angle = crank_angle
+        self.events = []
+        for position, cylinder in enumerate(self.firing_order):
+            # Firing TDC of this cylinder at or after the current crank angle
+            tdc = position * CYCLE / self.cylinders
+            tdc += CYCLE * ((crank_angle - tdc) // CYCLE + 1)
+            self.events.append((tdc - CYCLE - self.spark_advance, SPARK, cylinder, tdc - CYCLE))
+            for kind, offset in VALVE_TIMING.items():
+                self.events.append((tdc - CYCLE + offset, kind, cylinder, tdc - CYCLE))
+        # Drop events already behind us, they come back one cycle later
+        self.events = [self.next_occurrence(event) if event[0] <= crank_angle else event for event in self.events]
+        heapq.heapify(self.events)
+
+        # Valve states at crank_angle follow from where each cylinder is in its cycle
+        for position, cylinder in enumerate(self.firing_order):
+            phase = (crank_angle - position * CYCLE / self.cylinders) % CYCLE
+            self.exhaust_valve_open[cylinder] = VALVE_TIMING[EXHAUST_OPEN] < phase <= VALVE_TIMING[EXHAUST_CLOSE]
+            self.intake_valve_open[cylinder] = VALVE_TIMING[INTAKE_OPEN] < phase <= VALVE_TIMING[INTAKE_CLOSE]
+
+    def next_occurrence(self, event):
+        """The same event one cycle later, with the spark moved to the current advance."""
+        angle, kind, cylinder, tdc = event
+        tdc += CYCLE
+        if kind == SPARK:
+            return (tdc - self.spark_advance, kind, cylinder, tdc)
+        return (angle + CYCLE, kind, cylinder, tdc)
+
+    def advance_to(self, crank_angle):
+        """Process every event up to crank_angle."""
+        events = self.events
+        while events[0][0] <= crank_angle:
+            event = events[0]
+            kind, cylinder = event[1], event[2]
+            if kind == SPARK:
+                if self.on_spark is not None:
+                    self.on_spark(cylinder)
+            elif kind == EXHAUST_OPEN:
+                self.exhaust_valve_open[cylinder] = True
+            elif kind == EXHAUST_CLOSE:
+                self.exhaust_valve_open[cylinder] = False
+            elif kind == INTAKE_OPEN:
+                self.intake_valve_open[cylinder] = True
+            else:
+                self.intake_valve_open[cylinder] = False
+            heapq.heapreplace(events, self.next_occurrence(event))
+        self.crank_angle = crank_angle
+
+    def skip_to(self, crank_angle):
+        """
+        Same as advance_to, but whole cycles are skipped by shifting every queued event instead of popping them.
+        Valve states repeat every cycle; returns the number of cycles skipped, whose sparks were not reported.
+        """
+        cycles = int((crank_angle - self.crank_angle) // CYCLE)
+        if cycles > 0:
+            # A uniform shift keeps the heap ordered
+            shift = cycles * CYCLE
+            self.events = [(angle + shift, kind, cylinder, tdc + shift) for angle, kind, cylinder, tdc in self.events]
+        self.advance_to(crank_angle)
+        return max(cycles, 0)
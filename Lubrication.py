@@ -0,0 +1,114 @@
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from OilPan import OilPan
+from OilPump import OilPump
+
+# Table grid: engine rpm x oil temperature
+TABLE_MAX_RPM = 10000.0
+TABLE_RPM_POINTS = 81
+TABLE_MIN_TEMPERATURE = -30.0  # °C
+TABLE_MAX_TEMPERATURE = 160.0  # °C
+TABLE_TEMPERATURE_POINTS = 39
+
+
+def viscosity_ratio(oil_temperature):
+    """Oil viscosity relative to its value at 100 °C (roughly a 5W-30 oil)."""
+    return np.exp(0.03 * (100.0 - oil_temperature))
+
+
+def pressure_table(rpm, oil_temperature, pump_ratio, relief_pressure):
+    """Oil pressure in bar: pump flow against viscous resistance, capped by the relief valve."""
+    pump_rpm = rpm * pump_ratio
+    return np.minimum(0.9e-3 * pump_rpm * np.sqrt(viscosity_ratio(oil_temperature)), relief_pressure)
+
+
+def friction_table(rpm, oil_temperature, pressure):
+    """Friction mean effective pressure in bar, thicker oil and starved bearings both add to it."""
+    krpm = rpm / 1000
+    fmep = (0.4 + 0.1 * krpm + 0.03 * krpm ** 2) * viscosity_ratio(oil_temperature) ** 0.25
+    # Below about 0.5 bar the bearings run in boundary lubrication
+    starvation = np.clip((0.5 - pressure) / 0.5, 0.0, 1.0)
+    return fmep * (1 + 0.5 * starvation * (rpm > 0))
+
+
+class Lubrication:
+    """
+    Oil pan, oil pump and friction losses.
+    Pressure and friction are precomputed over rpm x oil temperature, a tick only interpolates them.
+    """
+
+    def __init__(self, oil_pan=None, oil_pump=None, pump_ratio=1.0, relief_pressure=5.0):
+        self.oil_pan = oil_pan or OilPan(volume_oil_pan=4.0)
+        self.oil_pump = oil_pump or OilPump(rpm=0.0)
+        self.pump_ratio = pump_ratio  # Pump rpm per crankshaft rpm
+        self.relief_pressure = relief_pressure  # bar
+
+        self.oil_temperature = 30.0  # °C
+        self.pressure = 0.0  # bar
+        self.fmep = 0.0  # bar
+
+        rpm = np.linspace(0.0, TABLE_MAX_RPM, TABLE_RPM_POINTS)
+        temperature = np.linspace(TABLE_MIN_TEMPERATURE, TABLE_MAX_TEMPERATURE, TABLE_TEMPERATURE_POINTS)
+        rpm_grid, temperature_grid = np.meshgrid(rpm, temperature, indexing="ij")
+        self.pressure_grid = pressure_table(rpm_grid, temperature_grid, pump_ratio, relief_pressure)
+        self.fmep_grid = friction_table(rpm_grid, temperature_grid, self.pressure_grid)
+        # Nested lists: indexing them per tick is far cheaper than indexing numpy arrays
+        self.pressure_table = self.pressure_grid.tolist()
+        self.fmep_table = self.fmep_grid.tolist()
+        self.rpm_step = rpm[1] - rpm[0]
+        self.temperature_step = temperature[1] - temperature[0]
+
+    def oil_time_constant(self):
+        """Seconds for the oil to follow the coolant, more oil warms up slower."""
+        return 60.0 * self.oil_pan.volume_oil_pan
+
+    def lookup(self, rpm, oil_temperature):
+        """Bilinear interpolation of (pressure, fmep) at one operating point."""
+        x = min(max(rpm / self.rpm_step, 0.0), TABLE_RPM_POINTS - 1.000001)
+        y = min(max((oil_temperature - TABLE_MIN_TEMPERATURE) / self.temperature_step, 0.0), TABLE_TEMPERATURE_POINTS - 1.000001)
+        i, j = int(x), int(y)
+        fx, fy = x - i, y - j
+        weights = ((1 - fx) * (1 - fy), (1 - fx) * fy, fx * (1 - fy), fx * fy)
+
+        values = []
+        for table in (self.pressure_table, self.fmep_table):
+            row, next_row = table[i], table[i + 1]
+            values.append(weights[0] * row[j] + weights[1] * row[j + 1] + weights[2] * next_row[j] + weights[3] * next_row[j + 1])
+        return values
+
+    def lookup_arrays(self, rpm, oil_temperature):
+        """Vectorized lookup for arrays of operating points, used by EngineBatch."""
+        x = np.clip(rpm / self.rpm_step, 0.0, TABLE_RPM_POINTS - 1.000001)
+        y = np.clip((oil_temperature - TABLE_MIN_TEMPERATURE) / self.temperature_step, 0.0, TABLE_TEMPERATURE_POINTS - 1.000001)
+        i, j = x.astype(int), y.astype(int)
+        fx, fy = x - i, y - j
+
+        values = []
+        for grid in (self.pressure_grid, self.fmep_grid):
+            values.append((1 - fx) * ((1 - fy) * grid[i, j] + fy * grid[i, j + 1]) + fx * ((1 - fy) * grid[i + 1, j] + fy * grid[i + 1, j + 1]))
+        return values
+
+    def update(self, rpm, coolant_temperature, dt):
+        """Advance the oil temperature by dt seconds and look up pressure and friction."""
+        self.oil_pump.rpm = rpm * self.pump_ratio
+        # Oil runs a little hotter than the coolant under load
+        target = coolant_temperature + rpm / 1000 * 2.0
+        self.oil_temperature += (target - self.oil_temperature) * min(dt / self.oil_time_constant(), 1.0)
+        self.pressure, self.fmep = self.lookup(rpm, self.oil_temperature)
+
+    def advance(self, rpm, coolant_temperature, dt, ticks):
+        """Same as calling update() ticks times with constant inputs, in closed form."""
+        self.oil_pump.rpm = rpm * self.pump_ratio
+        target = coolant_temperature + rpm / 1000 * 2.0
+        self.oil_temperature = target + (self.oil_temperature - target) * (1 - min(dt / self.oil_time_constant(), 1.0)) ** ticks
+        self.pressure, self.fmep = self.lookup(rpm, self.oil_temperature)
+
+    def friction_torque(self, displacement):
+        """Friction and pumping torque in Nm for a four-stroke engine of the given displacement in liters."""
+        return self.fmep * 1e5 * displacement * 1e-3 / (4 * math.pi)
@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+# Immutable copy of everything the dashboard draws
+EngineSnapshot = namedtuple("EngineSnapshot", [
+    "tick", "simulated_time", "throttle", "is_running",
+    "rpm", "sensor_rpm", "torque", "power", "normal_temperature", "sensor_temperature",
+    "max_temperature", "max_power_rpm", "cylinders", "firing_order",
+    "intake_valve_open", "exhaust_valve_open",
+])
+
+
+def take_snapshot(engine, tick, throttle):
+    return EngineSnapshot(
+        tick=tick,
+        simulated_time=tick * engine.time_step,
+        throttle=throttle,
+        is_running=engine.is_running,
+        rpm=engine.rpm,
+        sensor_rpm=engine.sensor_rpm,
+        torque=engine.torque,
+        power=engine.power,
+        normal_temperature=engine.normal_temperature,
+        sensor_temperature=engine.sensor_temperature,
+        max_temperature=engine.max_temperature,
+        max_power_rpm=engine.max_power_rpm,
+        cylinders=engine.cylinders,
+        firing_order=tuple(engine.firing_order),
+        intake_valve_open=tuple(engine.intake_valve_open),
+        exhaust_valve_open=tuple(engine.exhaust_valve_open),
+    )
+
+
+class SnapshotBuffer:
+    """Two snapshot slots: the writer fills the back slot, then flips which one readers see."""
+
+    def __init__(self, initial):
+        self.slots = [initial, initial]
+        self.front = 0
+
+    def publish(self, snapshot):
+        back = 1 - self.front
+        self.slots[back] = snapshot
+        # A single int store, readers see either the old or the new front slot, never a mix
+        self.front = back
+
+    def latest(self):
+        return self.slots[self.front]
+
+
+class RateMeter:
+    """Events per second, measured over windows of about half a second."""
+
+    def __init__(self, window=0.5):
+        self.window = window
+        self.rate = 0.0
+        self.count = 0
+        self.window_start = time.perf_counter()
+
+    def tick(self, count=1):
+        self.count += count
+        now = time.perf_counter()
+        if now - self.window_start >= self.window:
+            self.rate = self.count / (now - self.window_start)
+            self.count = 0
+            self.window_start = now
+
+
+class SimulationThread(threading.Thread):
+    """
+    Steps the engine at a fixed rate on its own thread and publishes snapshots for the render loop.
+    Simulated time follows wall time whatever the frame rate; when the thread falls too far behind
+    it drops the backlog instead of running faster than real time.
+    Chart samples go through a deque that the render loop drains, so physics never waits on drawing.
+    """
+
+    def __init__(self, engine, throttle_step=0.00035, max_backlog=0.25, max_samples=60000):
+        super().__init__(name="engine-simulation", daemon=True)
+        self.engine = engine
+        self.period = engine.time_step  # Seconds of wall time per simulate() call
+        # (sensor rpm, torque, power, sensor temperature) per tick; append and popleft are thread-safe,
+        # the oldest samples are dropped if the render loop stops draining
+        self.samples = deque(maxlen=max_samples)
+        self.throttle_step = throttle_step  # Throttle change per tick while UP is held or released
+        self.max_backlog = max_backlog  # Seconds
+
+        self.commands = queue.SimpleQueue()
+        self.throttle_up = False
+        self.throttle = 0.0
+        self.tick_count = 0
+        self.dropped_ticks = 0
+        self.simulation_rate = RateMeter()
+        self.buffer = SnapshotBuffer(take_snapshot(engine, 0, 0.0))
+        self.running = threading.Event()
+
+    def start_engine(self):
+        self.commands.put("start")
+
+    def stop_engine(self):
+        self.commands.put("stop")
+
+    def latest(self):
+        """Most recent published snapshot, safe to call from any thread."""
+        return self.buffer.latest()
+
+    def drain_samples(self):
+        """Chart samples produced since the last call, oldest first; call from the render thread."""
+        samples = []
+        while self.samples:
+            samples.append(self.samples.popleft())
+        return samples
+
+    def shutdown(self):
+        self.running.clear()
+        self.join()
+
+    def step(self):
+        while not self.commands.empty():
+            command = self.commands.get()
+            if command == "start":
+                self.engine.start()
+            elif command == "stop":
+                self.engine.stop()
+
+        if self.throttle_up:
+            self.throttle = min(self.throttle + self.throttle_step, 1.0)
+        else:
+            self.throttle = max(self.throttle - self.throttle_step, 0.0)
+
+        self.engine.simulate(self.throttle)
+        self.tick_count += 1
+
+    def run(self):
+        self.running.set()
+        engine = self.engine
+        start = time.perf_counter()
+        done = 0
+        while self.running.is_set():
+            due = int((time.perf_counter() - start) / self.period) - done
+            if due * self.period > self.max_backlog:
+                # Too far behind: give up on the backlog rather than spiral
+                skipped = due - 1
+                self.dropped_ticks += skipped
+                done += skipped
+                due = 1
+
+            if due > 0:
+                for _ in range(due):
+                    self.step()
+                    self.samples.append((engine.sensor_rpm, engine.torque, engine.power, engine.sensor_temperature))
+                done += due
+                self.simulation_rate.tick(due)
+                self.buffer.publish(take_snapshot(engine, self.tick_count, self.throttle))
+
+            # Sleep until the next tick is due
+            delay = start + (done + 1) * self.period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
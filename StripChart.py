@@ -0,0 +1,122 @@
+import pygame
+
+
+class MinMaxPyramid:
+    """
+    History of one channel with min/max summaries at every power-of-two resolution.
+    Level k holds the min and max of consecutive blocks of 2**k samples.
+    Each level only keeps its newest `retain` blocks: a view of up to retain buckets, whether the
+    latest window or the whole run, always finds the level it needs, and memory is O(retain * log n).
+    """
+
+    def __init__(self, retain=2048):
+        self.retain = retain
+        self.count = 0
+        self.mins = [[]]
+        self.maxs = [[]]
+        self.dropped = [0]  # Blocks discarded from the front of each level
+
+    def __len__(self):
+        return self.count
+
+    def last(self):
+        return self.mins[0][-1]
+
+    def append(self, value):
+        """Add a sample and fold completed blocks upward, amortized O(1)."""
+        self.mins[0].append(value)
+        self.maxs[0].append(value)
+        self.count += 1
+        self.trim(0)
+        level = 0
+        count = self.count
+        while count % 2 == 0:
+            if level + 1 == len(self.mins):
+                self.mins.append([])
+                self.maxs.append([])
+                self.dropped.append(0)
+            lower_mins, lower_maxs = self.mins[level], self.maxs[level]
+            self.mins[level + 1].append(min(lower_mins[-2], lower_mins[-1]))
+            self.maxs[level + 1].append(max(lower_maxs[-2], lower_maxs[-1]))
+            level += 1
+            self.trim(level)
+            count //= 2
+
+    def trim(self, level):
+        # Drop the older half once a level holds twice what it retains, so trimming is amortized O(1)
+        excess = len(self.mins[level]) - self.retain
+        if excess >= self.retain:
+            del self.mins[level][:excess]
+            del self.maxs[level][:excess]
+            self.dropped[level] += excess
+
+    def buckets(self, start, stop, max_buckets):
+        """
+        Min/max of samples start..stop in roughly max_buckets buckets (max_buckets < retain).
+        Cost depends on max_buckets, not on stop - start.
+        """
+        level = 0
+        while (stop - start) >> level > max_buckets and level + 1 < len(self.mins):
+            level += 1
+
+        first, last = start >> level, stop >> level
+        offset = self.dropped[level]
+        mins = self.mins[level][first - offset:last - offset]
+        maxs = self.maxs[level][first - offset:last - offset]
+
+        # Samples after the last complete block: at most one block from each lower level
+        position = last << level
+        if position < stop:
+            tail_min, tail_max = float("inf"), float("-inf")
+            for lower in range(level - 1, -1, -1):
+                if position + (1 << lower) <= stop:
+                    index = (position >> lower) - self.dropped[lower]
+                    tail_min = min(tail_min, self.mins[lower][index])
+                    tail_max = max(tail_max, self.maxs[lower][index])
+                    position += 1 << lower
+            mins.append(tail_min)
+            maxs.append(tail_max)
+        return mins, maxs
+
+
+class StripChart:
+    """Scrolling chart of one engine value drawn as a min/max envelope."""
+
+    def __init__(self, label, unit, rect, color, span=None):
+        self.label = label
+        self.unit = unit
+        self.rect = pygame.Rect(rect)
+        self.color = color
+        self.span = span  # Samples shown, None for the whole history
+        # A few times the width in blocks per level covers the window and the whole-run view
+        self.history = MinMaxPyramid(retain=4 * self.rect.width)
+
+    def append(self, value):
+        self.history.append(value)
+
+    def draw(self, screen, font):
+        pygame.draw.rect(screen, (45, 45, 45), self.rect)
+        count = len(self.history)
+        if count == 0:
+            return
+
+        start = 0 if self.span is None else max(count - self.span, 0)
+        mins, maxs = self.history.buckets(start, count, self.rect.width)
+        low, high = min(mins), max(maxs)
+        if high - low < 1e-9:
+            low, high = low - 1.0, high + 1.0
+
+        # Leave room for the label above the plot
+        x_scale = (self.rect.width - 1) / max(len(mins) - 1, 1)
+        y_scale = (self.rect.height - 24) / (high - low)
+        bottom = self.rect.bottom - 4
+        upper = [(self.rect.left + i * x_scale, bottom - (value - low) * y_scale) for i, value in enumerate(maxs)]
+        lower = [(self.rect.left + i * x_scale, bottom - (value - low) * y_scale) for i, value in enumerate(mins)]
+
+        if len(upper) > 1:
+            pygame.draw.polygon(screen, self.color, upper + lower[::-1])
+        else:
+            pygame.draw.line(screen, self.color, upper[0], lower[0])
+
+        text = f"{self.label}: {self.history.last():.1f} {self.unit}  [{low:.0f}..{high:.0f}]"
+        screen.blit(font.render(text, True, (255, 255, 255)), (self.rect.left + 4, self.rect.top + 2))
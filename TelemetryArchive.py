@@ -0,0 +1,239 @@
+import json
+import math
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Recorded channels and the quantum each is rounded to before encoding
+CHANNELS = {
+    "rpm": 0.01,
+    "torque": 0.01,  # Nm
+    "power": 0.001,  # kW
+    "normal_temperature": 0.01,  # °C
+    "throttle": 1e-4,
+}
+
+CHUNK_SIZE = 65536  # Samples per chunk, the unit a range read decodes
+MAGIC = b"ENGTLM1\n"
+TRAILER = struct.Struct("<Q8s")  # Footer offset, magic
+
+
+def encode_column(values, quantum):
+    """
+    Quantize, delta and zigzag encode, then bit-pack with the narrowest width that holds every delta.
+    Returns (first value, bit width, packed bytes). Raises ValueError on NaN or infinite values,
+    which have no integer quantization and would corrupt every later delta.
+    """
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    if not finite.all():
+        raise ValueError(f"cannot encode non-finite value {values[~finite][0]} at sample {int(np.argmin(finite))}")
+    quantized = np.round(values / quantum).astype(np.int64)
+    deltas = np.diff(quantized)
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+    width = int(zigzag.max()).bit_length() if len(zigzag) else 0
+    if width == 0:
+        return int(quantized[0]), 0, b""
+    bits = (zigzag[:, None] >> np.arange(width, dtype=np.uint64)) & np.uint64(1)
+    return int(quantized[0]), width, np.packbits(bits.astype(np.uint8).ravel(), bitorder="little").tobytes()
+
+
+def decode_column(first, width, data, count, quantum):
+    """Inverse of encode_column for a chunk of count samples."""
+    if width == 0:
+        return np.full(count, first * quantum)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=(count - 1) * width, bitorder="little")
+    shifted = bits.reshape(count - 1, width).astype(np.uint64) << np.arange(width, dtype=np.uint64)
+    zigzag = np.bitwise_or.reduce(shifted, axis=1)
+    deltas = ((zigzag >> np.uint64(1)) ^ (np.uint64(0) - (zigzag & np.uint64(1)))).astype(np.int64)
+    quantized = np.empty(count, dtype=np.int64)
+    quantized[0] = first
+    np.cumsum(deltas, out=quantized[1:])
+    quantized[1:] += first
+    return quantized * quantum
+
+
+class TelemetryWriter:
+    """
+    Writes engine telemetry to a columnar archive.
+    Samples are buffered and written one chunk at a time; every channel of a chunk is encoded
+    separately and the valve states are stored as bitsets. The footer indexes chunks by start tick.
+    Attach as engine.telemetry to record every simulate() call.
+    """
+
+    def __init__(self, path, cylinders, time_step, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.cylinders = cylinders
+        self.time_step = time_step
+        self.chunk_size = chunk_size
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+
+        self.columns = {name: [] for name in CHANNELS}
+        self.valves = []  # Intake then exhaust valve states of every cylinder, per sample
+        self.chunks = []
+        self.ticks = 0  # Samples written so far
+
+    def record(self, engine, throttle):
+        """Append the current state of an Engine as one sample; raises ValueError if any value is NaN or infinite."""
+        # One sum catches every non-finite value (inf - inf is NaN), nothing is buffered if it fails
+        if not math.isfinite(engine.rpm + engine.torque + engine.power + engine.normal_temperature + throttle):
+            raise ValueError(f"non-finite engine state at tick {self.ticks + len(self.valves)}")
+        columns = self.columns
+        columns["rpm"].append(engine.rpm)
+        columns["torque"].append(engine.torque)
+        columns["power"].append(engine.power)
+        columns["normal_temperature"].append(engine.normal_temperature)
+        columns["throttle"].append(throttle)
+        self.valves.append(engine.intake_valve_open + engine.exhaust_valve_open)
+        if len(self.valves) >= self.chunk_size:
+            self.flush()
+
+    def append(self, valves, **columns):
+        """Append arrays of samples; valves is a (samples, 2 * cylinders) boolean array, intake first."""
+        arrays = {name: np.asarray(columns[name], dtype=float) for name in CHANNELS}
+        # Checked before anything is buffered so a bad batch leaves the writer usable
+        for name, values in arrays.items():
+            if not np.isfinite(values).all():
+                raise ValueError(f"channel '{name}' has NaN or infinite samples")
+        for name in CHANNELS:
+            self.columns[name].extend(arrays[name].tolist())
+        self.valves.extend(np.asarray(valves, dtype=bool).tolist())
+        while len(self.valves) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Encode and write up to one chunk of buffered samples."""
+        count = min(len(self.valves), self.chunk_size)
+        if count == 0:
+            return
+        chunk = {"start": self.ticks, "count": count, "columns": {}}
+        for name, quantum in CHANNELS.items():
+            try:
+                first, width, data = encode_column(self.columns[name][:count], quantum)
+            except ValueError as error:
+                raise ValueError(f"channel '{name}', chunk starting at tick {self.ticks}: {error}") from None
+            chunk["columns"][name] = [self.file.tell(), len(data), width, first]
+            self.file.write(data)
+            del self.columns[name][:count]
+
+        valves = np.packbits(np.array(self.valves[:count], dtype=bool).ravel(), bitorder="little").tobytes()
+        chunk["valves"] = [self.file.tell(), len(valves)]
+        self.file.write(valves)
+        del self.valves[:count]
+
+        self.chunks.append(chunk)
+        self.ticks += count
+
+    def close(self):
+        while self.valves:
+            self.flush()
+        footer = json.dumps({
+            "cylinders": self.cylinders,
+            "time_step": self.time_step,
+            "channels": CHANNELS,
+            "chunks": self.chunks,
+        }).encode()
+        offset = self.file.tell()
+        self.file.write(footer)
+        self.file.write(TRAILER.pack(offset, MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TelemetryArchive:
+    """Reads a telemetry archive; range reads only decode the chunks that overlap the range."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            trailer = file.seek(-TRAILER.size, os.SEEK_END)
+            offset, magic = TRAILER.unpack(file.read(TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a telemetry archive or was not closed")
+            file.seek(offset)
+            footer = json.loads(file.read(trailer - offset))
+
+        self.cylinders = footer["cylinders"]
+        self.time_step = footer["time_step"]
+        self.channels = footer["channels"]
+        self.chunks = footer["chunks"]
+        # Time index: first tick of every chunk
+        self.chunk_starts = np.array([chunk["start"] for chunk in self.chunks], dtype=np.int64)
+
+    def __len__(self):
+        return self.chunks[-1]["start"] + self.chunks[-1]["count"] if self.chunks else 0
+
+    def duration(self):
+        return len(self) * self.time_step
+
+    def read(self, start=None, stop=None, channels=None):
+        """
+        Samples with start <= time < stop (seconds) as NumPy arrays keyed by channel, plus 'time',
+        'intake_valve_open' and 'exhaust_valve_open' ((samples, cylinders) booleans).
+        """
+        first_tick = 0 if start is None else max(int(np.ceil(start / self.time_step - 1e-9)), 0)
+        stop_tick = len(self) if stop is None else min(int(np.ceil(stop / self.time_step - 1e-9)), len(self))
+        channels = list(self.channels) if channels is None else list(channels)
+        stop_tick = max(stop_tick, first_tick)
+
+        # Chunks overlapping [first_tick, stop_tick)
+        low = max(int(np.searchsorted(self.chunk_starts, first_tick, side="right")) - 1, 0)
+        high = int(np.searchsorted(self.chunk_starts, stop_tick, side="left"))
+
+        parts = {name: [] for name in channels + ["valves"]}
+        with open(self.path, "rb") as file:
+            for chunk in self.chunks[low:high]:
+                count = chunk["count"]
+                begin = max(first_tick - chunk["start"], 0)
+                end = min(stop_tick - chunk["start"], count)
+                for name in channels:
+                    offset, length, width, first = chunk["columns"][name]
+                    file.seek(offset)
+                    values = decode_column(first, width, file.read(length), count, self.channels[name])
+                    parts[name].append(values[begin:end])
+                offset, length = chunk["valves"]
+                file.seek(offset)
+                bits = np.unpackbits(np.frombuffer(file.read(length), dtype=np.uint8), count=count * 2 * self.cylinders, bitorder="little")
+                parts["valves"].append(bits.reshape(count, 2 * self.cylinders)[begin:end].astype(bool))
+
+        result = {name: np.concatenate(parts[name]) if parts[name] else np.empty(0) for name in channels}
+        valves = np.concatenate(parts["valves"]) if parts["valves"] else np.empty((0, 2 * self.cylinders), dtype=bool)
+        result["intake_valve_open"] = valves[:, :self.cylinders]
+        result["exhaust_valve_open"] = valves[:, self.cylinders:]
+        result["time"] = np.arange(first_tick, first_tick + len(valves)) * self.time_step
+        return result
+
+
+if __name__ == "__main__":
+    import time
+    from Engine import Engine
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "telemetry.engtlm"
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 120.0
+
+    engine = Engine()
+    engine.start()
+    started = time.perf_counter()
+    with TelemetryWriter(path, engine.cylinders, engine.time_step) as writer:
+        engine.telemetry = writer
+        steps = int(seconds / engine.time_step)
+        for step in range(steps):
+            # Slow throttle sweeps so every channel keeps changing
+            engine.simulate(0.5 + 0.5 * np.sin(step * engine.time_step * 0.2))
+        engine.telemetry = None
+    written = time.perf_counter() - started
+
+    archive = TelemetryArchive(path)
+    raw_size = len(archive) * (8 * len(CHANNELS) + 2 * archive.cylinders)
+    print(f"{len(archive)} samples in {written:.1f} s, {os.path.getsize(path) / 1e6:.2f} MB ({raw_size / os.path.getsize(path):.1f}x smaller than raw)")
+    started = time.perf_counter()
+    window = archive.read(seconds / 2, seconds / 2 + 1.0)
+    print(f"1 s window: {len(window['time'])} samples in {(time.perf_counter() - started) * 1000:.1f} ms")
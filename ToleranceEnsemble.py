@@ -0,0 +1,203 @@
+import math
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Engine"))
+
+from Const import Const
+from Piston import Piston
+from EngineBatch import EngineBatch
+from IgnitionScheduler import FIRING_ORDERS
+
+# Normal distribution of one manufactured dimension, sampled per cylinder
+Tolerance = namedtuple("Tolerance", ["nominal", "sigma"])
+
+GAMMA = 1.3  # For the Otto cycle efficiency of each compression ratio
+COOLANT_FLOOR = 30.0  # °C, Engine.temperature() stops cooling here; heat rejection scales the rise above it
+
+# Columns of the per-variant summary array
+SUMMARY_FIELDS = (
+    "peak_torque", "peak_power", "compression_ratio", "peak_temperature",
+    "primary_imbalance", "secondary_imbalance",
+)
+
+# Torque vs rpm histogram used for percentile bands
+RPM_BINS = 40
+TORQUE_BINS = 240
+
+
+def nominal_piston(engine, compression_ratio=10.0):
+    """Nominal piston for an engine; the chamber volume gives the requested compression ratio."""
+    bore = getattr(engine, "bore", Const.diameter)
+    swept_volume = engine.displacement * 1000 / engine.cylinders  # cm^3
+    stroke = getattr(engine, "stroke", swept_volume * 1000 / (math.pi / 4 * bore ** 2))  # mm
+    piston = Piston(diameter_piston=bore, conrod_length=1.66 * stroke, mass=0.45, piston_height=0.6 * bore, displacement=swept_volume)
+    return piston, stroke, swept_volume / (compression_ratio - 1)
+
+
+def default_tolerances(engine):
+    """Typical production spread of Piston.mass, Piston.conrod_length, Const.diameter and CombustionChamberVolume."""
+    piston, _, chamber_volume = nominal_piston(engine)
+    return {
+        "piston_mass": Tolerance(piston.mass, 0.003),  # kg
+        "conrod_length": Tolerance(piston.conrod_length, 0.05),  # mm
+        "bore": Tolerance(piston.diameter_piston, 0.01),  # mm
+        "combustion_chamber_volume": Tolerance(chamber_volume, 0.6),  # cm^3
+    }
+
+
+def otto_efficiency(compression_ratio):
+    return 1 - compression_ratio ** (1 - GAMMA)
+
+
+def run_batch(task):
+    """Simulate variants start..stop, write their summaries into shared memory and return their torque histogram."""
+    (memory_name, variants, start, stop, seed, tolerances, parameters, crank_angles, stroke, steps, torque_range) = task
+    size = stop - start
+    cylinders = len(crank_angles)
+    generator = np.random.default_rng(seed)
+    sample = {name: generator.normal(nominal, sigma, (size, cylinders)) for name, (nominal, sigma) in tolerances.items()}
+
+    # Displacement and compression ratio of every cylinder
+    swept_volume = math.pi / 4 * sample["bore"] ** 2 * stroke / 1000  # cm^3
+    compression_ratio = (swept_volume + sample["combustion_chamber_volume"]) / sample["combustion_chamber_volume"]
+    efficiency = otto_efficiency(compression_ratio)
+
+    nominal_volume = math.pi / 4 * tolerances["bore"].nominal ** 2 * stroke / 1000
+    nominal_ratio = (nominal_volume + tolerances["combustion_chamber_volume"].nominal) / tolerances["combustion_chamber_volume"].nominal
+    nominal_efficiency = otto_efficiency(nominal_ratio)
+    torque_scale = (swept_volume * efficiency).mean(axis=1) / (nominal_volume * nominal_efficiency)
+    heat_scale = (swept_volume * (1 - efficiency)).mean(axis=1) / (nominal_volume * (1 - nominal_efficiency))
+
+    # Shaking forces of an inline crank at max power rpm from per-cylinder reciprocating mass and rod ratio
+    crank_radius = stroke / 2000  # m
+    omega = np.asarray(parameters["max_power_rpm"]) * math.pi / 30
+    throws = np.exp(1j * np.radians(crank_angles))
+    primary = crank_radius * omega ** 2 * np.abs((sample["piston_mass"] * throws).sum(axis=1))
+    rod_ratio = stroke / 2 / sample["conrod_length"]
+    secondary = crank_radius * omega ** 2 * np.abs((sample["piston_mass"] * rod_ratio * throws ** 2).sum(axis=1))
+
+    # More heat into the coolant warms the idle set point further above the floor and slows the cooling
+    thermal = {
+        "warm_idle_temperature": COOLANT_FLOOR + (np.asarray(parameters["warm_idle_temperature"]) - COOLANT_FLOOR) * heat_scale,
+        "cooling_per_rpm": np.asarray(parameters["cooling_per_rpm"]) / heat_scale,
+        "cooling_offset": np.asarray(parameters["cooling_offset"]) / heat_scale,
+    }
+
+    # Full-throttle ramp from idle, only running maxima and a fixed-size histogram are kept
+    batch = EngineBatch(size, **dict(parameters, max_torque=parameters["max_torque"] * torque_scale, **thermal))
+    histogram = np.zeros((RPM_BINS, TORQUE_BINS), dtype=np.int64)
+    rpm_scale = RPM_BINS / float(np.max(parameters["max_power_rpm"]))
+    torque_low, torque_high = torque_range
+    torque_scale_bins = TORQUE_BINS / (torque_high - torque_low)
+    peak_torque = np.full(size, -np.inf)
+    peak_power = np.full(size, -np.inf)
+    peak_temperature = np.full(size, -np.inf)
+    for step in range(steps):
+        batch.simulate(step / steps)
+        np.maximum(peak_torque, batch.torque, out=peak_torque)
+        np.maximum(peak_power, batch.power, out=peak_power)
+        np.maximum(peak_temperature, batch.normal_temperature, out=peak_temperature)
+        rpm_bin = np.clip((batch.rpm * rpm_scale).astype(int), 0, RPM_BINS - 1)
+        torque_bin = np.clip(((batch.torque - torque_low) * torque_scale_bins).astype(int), 0, TORQUE_BINS - 1)
+        np.add.at(histogram, (rpm_bin, torque_bin), 1)
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        summary = np.ndarray((variants, len(SUMMARY_FIELDS)), dtype=np.float64, buffer=memory.buf)
+        summary[start:stop] = np.column_stack((
+            peak_torque, peak_power, compression_ratio.mean(axis=1), peak_temperature, primary, secondary,
+        ))
+        del summary
+    finally:
+        memory.close()
+    return histogram
+
+
+class EnsembleResult:
+    """Per-variant summaries plus the merged torque histogram, no time traces."""
+
+    def __init__(self, summary, histogram, max_rpm, torque_range):
+        self.summary = summary
+        self.histogram = histogram
+        self.max_rpm = max_rpm
+        self.torque_range = torque_range
+
+    def column(self, field):
+        return self.summary[:, SUMMARY_FIELDS.index(field)]
+
+    def percentiles(self, field, q=(5, 50, 95)):
+        return np.percentile(self.column(field), q)
+
+    def torque_bands(self, q=(5, 50, 95)):
+        """Torque percentiles in every rpm bin across all variants and steps; NaN where a bin was never visited."""
+        rpm = (np.arange(RPM_BINS) + 0.5) * self.max_rpm / RPM_BINS
+        torque_low, torque_high = self.torque_range
+        torque = torque_low + (np.arange(TORQUE_BINS) + 0.5) * (torque_high - torque_low) / TORQUE_BINS
+        counts = np.cumsum(self.histogram, axis=1)
+        totals = counts[:, -1]
+        bands = np.full((len(q), RPM_BINS), np.nan)
+        for row in np.flatnonzero(totals):
+            bins = np.searchsorted(counts[row], np.asarray(q) / 100 * totals[row])
+            bands[:, row] = torque[np.minimum(bins, TORQUE_BINS - 1)]
+        return rpm, bands
+
+
+class ToleranceEnsemble:
+    """Monte Carlo spread of manufacturing tolerances, simulated in vectorized batches across a process pool."""
+
+    def __init__(self, engine, tolerances=None, steps=3000, batch_size=500, seed=None):
+        self.engine = engine
+        self.tolerances = tolerances or default_tolerances(engine)
+        self.steps = steps
+        self.batch_size = batch_size
+        self.seed = seed
+        _, self.stroke, _ = nominal_piston(engine)
+
+        firing_order = engine.ignition_scheduler.firing_order if hasattr(engine, "ignition_scheduler") else FIRING_ORDERS.get(engine.cylinders, list(range(engine.cylinders)))
+        self.crank_angles = [0.0] * engine.cylinders
+        for position, cylinder in enumerate(firing_order):
+            self.crank_angles[cylinder] = position * 720.0 / engine.cylinders % 360.0
+
+    def run(self, variants, workers=None):
+        if variants < 1:
+            raise ValueError(f"an ensemble needs at least one variant, got {variants}")
+        parameters = EngineBatch.engine_parameters(self.engine)
+        torque_range = (-0.5 * self.engine.max_torque, 1.5 * self.engine.max_torque)
+        batches = range(0, variants, self.batch_size)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(batches))
+
+        memory = shared_memory.SharedMemory(create=True, size=variants * len(SUMMARY_FIELDS) * 8)
+        try:
+            tasks = [
+                (memory.name, variants, start, min(start + self.batch_size, variants), seed, self.tolerances,
+                 parameters, self.crank_angles, self.stroke, self.steps, torque_range)
+                for start, seed in zip(batches, seeds)
+            ]
+            histogram = np.zeros((RPM_BINS, TORQUE_BINS), dtype=np.int64)
+            with ProcessPoolExecutor(workers) as pool:
+                for batch_histogram in pool.map(run_batch, tasks):
+                    histogram += batch_histogram
+            summary = np.ndarray((variants, len(SUMMARY_FIELDS)), dtype=np.float64, buffer=memory.buf).copy()
+        finally:
+            memory.close()
+            memory.unlink()
+        return EnsembleResult(summary, histogram, self.engine.max_power_rpm, torque_range)
+
+
+if __name__ == "__main__":
+    import time
+    from Engine import Engine
+
+    variants = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    started = time.perf_counter()
+    result = ToleranceEnsemble(Engine(), seed=1).run(variants)
+    print(f"{variants} variants in {time.perf_counter() - started:.1f} s")
+    for field in SUMMARY_FIELDS:
+        low, median, high = result.percentiles(field)
+        print(f"{field:<24}{low:>12.4f}{median:>12.4f}{high:>12.4f}")